@@ -148,7 +148,7 @@ class SessionReportAdmin(admin.ModelAdmin):
 
 @admin.register(StudentPerformance)
 class StudentPerformanceAdmin(admin.ModelAdmin):
-    list_display = ('student', 'course', 'total_attendance_percentage', 'average_assignment_score', 'violation_count')
+    list_display = ('student', 'course', 'total_attendance_percentage', 'average_assignment_score', 'violation_count', 'at_risk_score')
     list_filter = ('course', 'last_updated')
     search_fields = ('student__username', 'course__code')
     readonly_fields = ('last_updated',)
@@ -0,0 +1,147 @@
+import logging
+import math
+
+from django.core.cache import cache
+
+from .locks import cache_lock
+from .models import Violation
+
+
+logger = logging.getLogger(__name__)
+
+STUDENT_KEY = 'focus-anomaly:{}:{}'
+SESSION_KEY = 'focus-anomaly:{}'
+SESSION_LOCK_KEY = 'focus-anomaly-lock:{}'
+SESSION_LOCK_WAIT = 1         # seconds; a skipped sample barely moves the class baseline
+STATE_TIMEOUT = 60 * 60 * 6
+
+DISTRACTION_EVENTS = {'focus_lost', 'fullscreen_exit', 'alt_tab', 'app_switch', 'minimized'}
+RATE_TAU_SECONDS = 60         # decay constant of the rolling event rate
+BASELINE_ALPHA = 0.05         # weight of each new observation in the rolling mean/variance
+MIN_BASELINE_EVENTS = 5       # below this only the class-wide baseline is used
+MIN_BURST_RATE = 4.0          # never flag fewer than ~4 events in a minute
+MIN_STD = 0.5                 # variance floor so a perfectly steady baseline cannot explode z
+COALESCE_SECONDS = 5 * 60     # anomalies this close together extend one Violation
+SEVERITY_THRESHOLDS = (       # (minimum z-score, severity), highest first
+    (6.0, 'critical'),
+    (4.5, 'high'),
+    (3.0, 'medium'),
+)
+SEVERITY_ORDER = ['low', 'medium', 'high', 'critical']
+
+
+def _new_baseline():
+    return {'mean': 0.0, 'var': 0.0, 'n': 0}
+
+
+def _z(value, baseline):
+    std = max(math.sqrt(baseline['var']), MIN_STD)
+    return (value - baseline['mean']) / std
+
+
+def _learn(baseline, value):
+    """Exponentially weighted mean and variance; O(1) memory"""
+    if baseline['n'] == 0:
+        baseline['mean'] = value
+    else:
+        delta = value - baseline['mean']
+        baseline['mean'] += BASELINE_ALPHA * delta
+        baseline['var'] = (1 - BASELINE_ALPHA) * (baseline['var'] + BASELINE_ALPHA * delta * delta)
+    baseline['n'] += 1
+
+
+def _severity(z):
+    for threshold, severity in SEVERITY_THRESHOLDS:
+        if z >= threshold:
+            return severity
+    return None
+
+
+def _describe(counts, rate, z):
+    events = ', '.join(f'{name} x{count}' for name, count in sorted(counts.items()))
+    return f'Unusual burst of focus events ({events}); rate {rate:.1f}/min, z-score {z:.1f}'
+
+
+def observe(session_id, student_id, event_type, at):
+    """
+    Feed one FocusLog event to the detector.
+
+    Each student keeps a decayed event rate (events in roughly the last
+    RATE_TAU_SECONDS) plus a rolling baseline of that rate; the session keeps
+    a class-wide baseline, updated under a per-session lock since every
+    student's events train it. An event is anomalous when the current rate
+    is at least MIN_BURST_RATE and far above either baseline. State lives in
+    the cache, so nothing is read from the database. Returns the id of the
+    Violation created or extended, if any.
+    """
+    if event_type not in DISTRACTION_EVENTS:
+        return None
+    now = at.timestamp()
+    student_key = STUDENT_KEY.format(session_id, student_id)
+    session_key = SESSION_KEY.format(session_id)
+    found = cache.get_many([student_key, session_key])
+    student = found.get(student_key) or {
+        'rate': 0.0, 'at': now, 'baseline': _new_baseline(),
+        'violation': None, 'flagged_at': None, 'severity': None, 'counts': {},
+    }
+    session = found.get(session_key) or _new_baseline()
+
+    student['rate'] = student['rate'] * math.exp(-max(now - student['at'], 0) / RATE_TAU_SECONDS) + 1
+    student['at'] = now
+    rate = student['rate']
+
+    z_scores = [_z(rate, session)] if session['n'] >= MIN_BASELINE_EVENTS else []
+    if student['baseline']['n'] >= MIN_BASELINE_EVENTS:
+        z_scores.append(_z(rate, student['baseline']))
+    z = max(z_scores) if z_scores else 0.0
+    severity = _severity(z) if rate >= MIN_BURST_RATE else None
+
+    violation = None
+    if severity:
+        violation = _record(session_id, student_id, student, event_type, severity, rate, z, now)
+    else:
+        # Only normal behaviour trains the baselines, so a burst cannot hide itself
+        _learn(student['baseline'], rate)
+        _train_class_baseline(session_id, rate)
+
+    cache.set(student_key, student, STATE_TIMEOUT)
+    return violation
+
+
+def _train_class_baseline(session_id, rate):
+    key = SESSION_KEY.format(session_id)
+    try:
+        with cache_lock(SESSION_LOCK_KEY.format(session_id), timeout=SESSION_LOCK_WAIT):
+            baseline = cache.get(key) or _new_baseline()
+            _learn(baseline, rate)
+            cache.set(key, baseline, STATE_TIMEOUT)
+    except TimeoutError:
+        logger.warning('Skipped a class baseline update for session %s: lock busy', session_id)
+
+
+def _record(session_id, student_id, student, event_type, severity, rate, z, now):
+    """Create a Violation, or extend the still-open one from the same burst"""
+    recent = student['flagged_at'] is not None and now - student['flagged_at'] <= COALESCE_SECONDS
+    student['flagged_at'] = now
+    violation = None
+    if recent and student['violation']:
+        # Once faculty resolve it, a burst that keeps going opens a new one
+        violation = Violation.objects.filter(pk=student['violation'], is_resolved=False).first()
+    if violation is not None:
+        student['counts'][event_type] = student['counts'].get(event_type, 0) + 1
+        if SEVERITY_ORDER.index(severity) < SEVERITY_ORDER.index(student['severity']):
+            severity = student['severity']
+        student['severity'] = violation.severity = severity
+        violation.description = _describe(student['counts'], rate, z)
+        # save() so post_save reaches the live dashboard
+        violation.save(update_fields=['severity', 'description'])
+        return violation.id
+
+    student['counts'] = {event_type: 1}
+    student['severity'] = severity
+    violation = Violation.objects.create(
+        student_id=student_id, session_id=session_id, violation_type='focus_anomaly',
+        severity=severity, description=_describe(student['counts'], rate, z),
+    )
+    student['violation'] = violation.id
+    return violation.id
@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import token_blacklist
+from .models import Enrollment
+
+User = get_user_model()
+
+VERSION_CLAIM = 'ver'
+VERSION_KEY = 'claims-version:{}'
+ENROLLED_KEY = 'enrolled-courses:{}'
+ENROLLED_CACHE_TIMEOUT = 60 * 60  # Safety net; enrollment writes clear the entry
+# Per-process caches only see their own bumps; this bounds how long another
+# worker can keep accepting a revoked version
+VERSION_CACHE_TIMEOUT = 60
+# Fields a claims-backed request.user is built from; everything else is deferred
+USER_CLAIMS = {'username': 'username', 'role': 'role', 'college': 'college_id'}
+
+
+def user_claims(user):
+    """Authorization claims embedded in a user's tokens"""
+    claims = {
+        'username': user.username,
+        'role': user.role,
+        'college': user.college_id,
+        VERSION_CLAIM: user.claims_version,
+    }
+    if user.role == 'student':
+        claims['courses'] = sorted(enrolled_course_ids(user.pk))
+    return claims
+
+
+def enrolled_course_ids(user_id):
+    """Ids of the courses a student is actively enrolled in, cached per user"""
+    key = ENROLLED_KEY.format(user_id)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Enrollment.objects.filter(student_id=user_id, status='active').values_list('course_id', flat=True)
+        )
+        cache.set(key, course_ids, ENROLLED_CACHE_TIMEOUT)
+    return course_ids
+
+
+def forget_enrollments(user_ids):
+    cache.delete_many([ENROLLED_KEY.format(user_id) for user_id in user_ids])
+
+
+def current_version(user_id):
+    """The user's claims version, or None when the user no longer exists or is inactive"""
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id, is_active=True) \
+            .values_list('claims_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def revoke_claims(user_ids):
+    """Invalidate every token issued to these users; they must refresh to get new claims"""
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(claims_version=F('claims_version') + 1)
+    forget_version(user_ids)
+
+
+def forget_version(user_ids):
+    cache.delete_many([VERSION_KEY.format(user_id) for user_id in user_ids])
+
+
+def request_course_ids(request):
+    """
+    The requesting student's enrolled course ids: the token's claim when it
+    has one, otherwise the per-user cache. Cached on the request.
+    """
+    course_ids = getattr(request, '_enrolled_course_ids', None)
+    if course_ids is None:
+        token = request.auth
+        if token is not None and 'courses' in token:
+            course_ids = frozenset(token['courses'])
+        else:
+            course_ids = enrolled_course_ids(request.user.pk)
+        request._enrolled_course_ids = course_ids
+    return course_ids
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token carrying user_claims(); stale claims are reissued on refresh"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+        if token is None:
+            return
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        if self.payload.get(VERSION_CLAIM) != current_version(user_id):
+            user = User.objects.filter(pk=user_id, is_active=True).first()
+            if user is None:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+            self.payload.pop('courses', None)
+            for claim, value in user_claims(user).items():
+                self[claim] = value
+
+    def check_blacklist(self):
+        if token_blacklist.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        revoked = token_blacklist.blacklist(
+            self.payload[api_settings.JTI_CLAIM], str(self),
+            self.payload['exp'], self.payload.get(api_settings.USER_ID_CLAIM),
+        )
+        if not revoked:
+            raise TokenError('Token is blacklisted')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Builds request.user from the token's claims instead of loading the row.
+    Fields outside USER_CLAIMS are deferred and load on first access.
+    Tokens whose version no longer matches the user's are rejected.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Issued before claims existed
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        version = current_version(user_id)
+        if version is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed('Token claims are out of date; refresh the token', code='token_stale')
+
+        values = {'id': user_id, 'is_active': True, 'claims_version': version}
+        for claim, attname in USER_CLAIMS.items():
+            values[attname] = validated_token.get(claim)
+        names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+        return User.from_db('default', names, [values[name] for name in names])
@@ -0,0 +1,156 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .locks import cache_lock
+from .models import Note
+from .search import index_note
+
+
+BUFFER_KEY = 'note-autosave:{}'
+LOCK_KEY = 'note-autosave-lock:{}'
+DIRTY_KEY = 'note-autosave:dirty'
+# Buffers outlive the flush interval by a wide margin so the sweep can find them
+BUFFER_TIMEOUT = 60 * 60 * 24
+
+
+class StaleVersion(Exception):
+    """The client edited an older version than the one on the server."""
+
+    def __init__(self, current_version):
+        super().__init__(f'Note is at version {current_version}')
+        self.current_version = current_version
+
+
+def _lock(name, timeout=5):
+    return cache_lock(LOCK_KEY.format(name), timeout)
+
+
+def apply_deltas(content, deltas):
+    """
+    Apply [{"pos": int, "delete": int, "insert": str}, ...] in order.
+    Positions refer to the text as left by the previous op.
+    """
+    if not isinstance(deltas, list):
+        raise ValueError('deltas must be a list')
+    for delta in deltas:
+        if not isinstance(delta, dict):
+            raise ValueError('each delta must be an object')
+        try:
+            pos = int(delta.get('pos', 0))
+            delete = int(delta.get('delete', 0))
+        except (TypeError, ValueError):
+            raise ValueError('pos and delete must be integers')
+        insert = delta.get('insert', '')
+        if not isinstance(insert, str):
+            raise ValueError('insert must be a string')
+        if pos < 0 or delete < 0 or pos + delete > len(content):
+            raise ValueError(f'delta out of range for content of length {len(content)}')
+        content = content[:pos] + insert + content[pos + delete:]
+    return content
+
+
+def _mark_dirty(note_id, dirty):
+    with _lock('dirty'):
+        pending = cache.get(DIRTY_KEY) or set()
+        if dirty:
+            pending.add(note_id)
+        else:
+            pending.discard(note_id)
+        cache.set(DIRTY_KEY, pending, None)
+
+
+def _write(note_id, state):
+    updated = Note.objects.filter(pk=note_id).update(
+        content=state['content'], version=state['version'], updated_at=timezone.now()
+    )
+    state['dirty'] = False
+    state['flushed_at'] = time.time()
+    if updated:
+        # update() skips post_save, so refresh the search index by hand
+        index_note(Note.objects.get(pk=note_id))
+
+
+def autosave(note, base_version, deltas, flush=False):
+    """
+    Apply text deltas to a note's buffered content.
+
+    Edits accumulate in the cache and reach the database at most once per
+    NOTE_AUTOSAVE_INTERVAL seconds, or immediately when flush is requested.
+    Returns the buffer state ({"version", "content", "dirty", ...}).
+    """
+    key = BUFFER_KEY.format(note.pk)
+    with _lock(note.pk):
+        state = cache.get(key)
+        if state is None:
+            state = {
+                'version': note.version,
+                'content': note.content,
+                'dirty': False,
+                'flushed_at': 0,  # first edit of a burst is written straight away
+            }
+        if base_version != state['version']:
+            raise StaleVersion(state['version'])
+
+        state['content'] = apply_deltas(state['content'], deltas)
+        state['version'] += 1
+        was_dirty = state['dirty']
+        state['dirty'] = True
+
+        if flush or time.time() - state['flushed_at'] >= settings.NOTE_AUTOSAVE_INTERVAL:
+            _write(note.pk, state)
+        cache.set(key, state, BUFFER_TIMEOUT)
+
+    if state['dirty'] != was_dirty:
+        _mark_dirty(note.pk, state['dirty'])
+    return state
+
+
+def flush_pending(note_id):
+    """Write any buffered edits for a note; returns True if something was written"""
+    key = BUFFER_KEY.format(note_id)
+    with _lock(note_id):
+        state = cache.get(key)
+        if not state or not state['dirty']:
+            return False
+        _write(note_id, state)
+        cache.set(key, state, BUFFER_TIMEOUT)
+    _mark_dirty(note_id, False)
+    return True
+
+
+def flush_student(student_id):
+    """Write the buffered edits of one student's notes; returns how many were written"""
+    dirty = cache.get(DIRTY_KEY)
+    if not dirty:
+        return 0
+    owned = Note.objects.filter(pk__in=dirty, student_id=student_id).values_list('pk', flat=True)
+    return sum(flush_pending(note_id) for note_id in owned)
+
+
+def discard_buffer(note_id):
+    """Drop the buffer after a full update; returns the newest version it held"""
+    key = BUFFER_KEY.format(note_id)
+    with _lock(note_id):
+        state = cache.get(key)
+        cache.delete(key)
+    if state and state['dirty']:
+        _mark_dirty(note_id, False)
+    return state['version'] if state else None
+
+
+def flush_all(max_age=None):
+    """Flush every dirty buffer idle for at least max_age seconds"""
+    if max_age is None:
+        max_age = settings.NOTE_AUTOSAVE_INTERVAL
+    flushed = 0
+    for note_id in list(cache.get(DIRTY_KEY) or ()):
+        state = cache.get(BUFFER_KEY.format(note_id))
+        if state is None:
+            _mark_dirty(note_id, False)
+            continue
+        if time.time() - state['flushed_at'] >= max_age and flush_pending(note_id):
+            flushed += 1
+    return flushed
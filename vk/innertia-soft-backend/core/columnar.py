@@ -0,0 +1,178 @@
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Attendance, CompilerSubmission, FocusLog, Violation
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for analytics exports
+    pa = None
+
+
+CHUNK_SIZE = 50000  # rows per record batch / Parquet row group
+COMPRESSION = 'zstd'
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class ExportUnavailable(Exception):
+    """pyarrow is not installed"""
+
+
+def _json(value):
+    # JSON text keeps arbitrary nesting intact under a fixed column type
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+# dataset -> (model, time field used for the date range, [(field, column, type, convert)])
+# Types are names resolved against pyarrow lazily so the module imports without it.
+DATASETS = {
+    'focus_logs': (FocusLog, 'timestamp', [
+        ('id', 'id', 'int64', None),
+        ('student_id', 'student_id', 'int64', None),
+        ('session_id', 'session_id', 'int64', None),
+        ('session__course_id', 'course_id', 'int64', None),
+        ('event_type', 'event_type', 'category', None),
+        ('timestamp', 'timestamp', 'timestamp', None),
+        ('metadata', 'metadata', 'string', _json),
+    ]),
+    'attendance': (Attendance, 'recorded_at', [
+        ('id', 'id', 'int64', None),
+        ('student_id', 'student_id', 'int64', None),
+        ('session_id', 'session_id', 'int64', None),
+        ('session__course_id', 'course_id', 'int64', None),
+        ('status', 'status', 'category', None),
+        ('active_minutes', 'active_minutes', 'int32', None),
+        ('total_minutes', 'total_minutes', 'int32', None),
+        ('attendance_percentage', 'attendance_percentage', 'float64', None),
+        ('check_in_time', 'check_in_time', 'timestamp', None),
+        ('check_out_time', 'check_out_time', 'timestamp', None),
+        ('recorded_at', 'recorded_at', 'timestamp', None),
+    ]),
+    'violations': (Violation, 'timestamp', [
+        ('id', 'id', 'int64', None),
+        ('student_id', 'student_id', 'int64', None),
+        ('session_id', 'session_id', 'int64', None),
+        ('session__course_id', 'course_id', 'int64', None),
+        ('violation_type', 'violation_type', 'category', None),
+        ('severity', 'severity', 'category', None),
+        ('description', 'description', 'string', None),
+        ('timestamp', 'timestamp', 'timestamp', None),
+        ('is_resolved', 'is_resolved', 'bool_', None),
+        ('resolution_notes', 'resolution_notes', 'string', None),
+    ]),
+    'compiler_submissions': (CompilerSubmission, 'created_at', [
+        ('id', 'id', 'int64', None),
+        ('student_id', 'student_id', 'int64', None),
+        ('session_id', 'session_id', 'int64', None),
+        ('session__course_id', 'course_id', 'int64', None),
+        ('language', 'language', 'category', None),
+        ('code', 'code', 'string', None),
+        ('stdout', 'stdout', 'string', None),
+        ('stderr', 'stderr', 'string', None),
+        ('execution_time', 'execution_time', 'float64', None),
+        ('status', 'status', 'category', None),
+        ('created_at', 'created_at', 'timestamp', None),
+        ('executed_at', 'executed_at', 'timestamp', None),
+    ]),
+}
+
+
+def parse_bound(value):
+    """Accept YYYY-MM-DD or an ISO datetime; naive values use the current timezone"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _arrow_type(name):
+    if name == 'timestamp':
+        return pa.timestamp('us', tz='UTC')
+    if name == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return getattr(pa, name)()
+
+
+def schema(dataset):
+    _, _, columns = DATASETS[dataset]
+    return pa.schema(
+        [pa.field(column, _arrow_type(kind)) for _, column, kind, _ in columns],
+        metadata={'dataset': dataset},
+    )
+
+
+def _batch(columns, arrow_schema, rows, dictionaries):
+    arrays = []
+    for index, (_, _, kind, convert) in enumerate(columns):
+        values = [row[index] for row in rows]
+        if convert:
+            values = [convert(value) for value in values]
+        if kind == 'category':
+            # Dictionaries only ever grow, so later batches are written as deltas
+            codes = dictionaries.setdefault(index, {})
+            indices = [None if value is None else codes.setdefault(value, len(codes)) for value in values]
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=pa.int32()), pa.array(list(codes), type=pa.string()),
+            ))
+        else:
+            arrays.append(pa.array(values, type=arrow_schema.field(index).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+
+
+def _writer(sink, fmt, arrow_schema):
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, arrow_schema, compression=COMPRESSION)
+    options = ipc.IpcWriteOptions(compression=COMPRESSION, emit_dictionary_deltas=True)
+    return ipc.new_file(sink, arrow_schema, options=options)
+
+
+def export_dataset(dataset, sink, fmt='parquet', start=None, end=None, after_id=0):
+    """
+    Write rows of a dataset with id > after_id (and the time field within
+    [start, end) when given) to `sink` as Parquet or Arrow IPC.
+
+    Rows are read by keyset pagination on the primary key, CHUNK_SIZE at a
+    time, and each chunk becomes one compressed record batch / row group, so
+    memory is bounded by the chunk size. Returns (row_count, high_water_id).
+    """
+    if pa is None:
+        raise ExportUnavailable('pyarrow is required for columnar exports')
+    model, time_field, columns = DATASETS[dataset]
+    arrow_schema = schema(dataset)
+    fields = [field for field, _, _, _ in columns]
+
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+
+    count = 0
+    last_id = after_id or 0
+    dictionaries = {}
+    writer = _writer(sink, fmt, arrow_schema)
+    try:
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            writer.write_batch(_batch(columns, arrow_schema, rows, dictionaries))
+            count += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        writer.close()
+    return count, last_id
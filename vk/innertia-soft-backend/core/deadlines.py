@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Assignment, Submission
+
+
+BATCH_SIZE = 500  # assignments per UPDATE, keeps the IN list within backend limits
+
+
+def close_assignments(assignments, now=None):
+    """
+    Close every published assignment in the queryset whose due date has passed.
+
+    Submissions that arrived after their assignment's due date and are not
+    flagged yet get is_late with one set-based UPDATE per batch of assignments
+    (new submissions are flagged when they are made); the assignments are then
+    closed the same way, after which no submissions are accepted.
+    Returns (closed_count, late_count).
+    """
+    now = now or timezone.now()
+    due = assignments.filter(status='published', due_date__lte=now)
+
+    with transaction.atomic():
+        # Lock the batch so a concurrent sweep or edit cannot close it twice
+        ids = list(due.select_for_update().values_list('id', flat=True))
+        if not ids:
+            return 0, 0
+
+        closed = late = 0
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            late += Submission.objects.filter(
+                Exists(Assignment.objects.filter(
+                    pk=OuterRef('assignment_id'), due_date__lt=OuterRef('submitted_at'),
+                )),
+                assignment_id__in=batch,
+                is_late=False,
+            ).update(is_late=True)
+            closed += Assignment.objects.filter(id__in=batch).update(status='closed', closed_at=now)
+    return closed, late
+
+
+def close_due_assignments(now=None):
+    """Sweep all assignments whose deadline has passed (run from cron)"""
+    return close_assignments(Assignment.objects.all(), now=now)
@@ -0,0 +1,138 @@
+import uuid
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Attendance, ClassSession, Enrollment, Submission
+
+
+STAMP_KEY = 'course-stats:{}'
+DATA_KEY = 'course-stats:{}:{}:{}'
+CACHE_TIMEOUT = 60 * 60  # Safety net; writes invalidate through the stamp
+METRICS = ('attendance', 'scores', 'focus')
+QUANTILES = (10, 25, 50, 75, 90)
+PERCENT_BINS = np.linspace(0, 100, 11)
+FOCUS_BIN_COUNT = 10
+
+
+def bump(course_id):
+    """Invalidate every cached distribution of a course"""
+    cache.set(STAMP_KEY.format(course_id), uuid.uuid4().hex, None)
+
+
+def current_stamp(course_id):
+    key = STAMP_KEY.format(course_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def _enrolled(course):
+    return list(
+        Enrollment.objects.filter(course=course, status='active').values_list('student_id', flat=True)
+    )
+
+
+def _attendance_values(course, now):
+    students = _enrolled(course)
+    held = ClassSession.objects.filter(course=course, session_date__lte=now) \
+        .exclude(status='cancelled').count()
+    rows = dict(
+        (student_id, (total, records)) for student_id, total, records in
+        Attendance.objects.filter(session__course=course, student_id__in=students)
+        .values('student_id').annotate(total=Sum('attendance_percentage'), records=Count('id'))
+        .values_list('student_id', 'total', 'records')
+    )
+    # Held sessions without a record count as 0%
+    return students, [
+        (rows[s][0] / max(held, rows[s][1])) if s in rows and max(held, rows[s][1]) else 0.0
+        for s in students
+    ]
+
+
+def _score_values(course, now):
+    graded = Q(score__isnull=False, assignment__max_score__gt=0)
+    rows = list(
+        Submission.objects.filter(graded, assignment__course=course, student_id__in=_enrolled(course))
+        .values('student_id').annotate(pct=Sum(F('score') * 100.0 / F('assignment__max_score')), n=Count('id'))
+        .values_list('student_id', 'pct', 'n')
+    )
+    return [r[0] for r in rows], [r[1] / r[2] for r in rows]
+
+
+def _focus_values(course, now):
+    students = _enrolled(course)
+    minutes = dict(
+        Attendance.objects.filter(session__course=course, student_id__in=students)
+        .values('student_id').annotate(active=Sum('active_minutes'))
+        .values_list('student_id', 'active')
+    )
+    return students, [(minutes.get(s) or 0) / 60 for s in students]
+
+
+_LOADERS = {'attendance': _attendance_values, 'scores': _score_values, 'focus': _focus_values}
+
+
+def _summarize(metric, students, values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {'count': 0, 'histogram': {'edges': [], 'counts': []}, 'quantiles': {}}, {}
+    bins = PERCENT_BINS if metric != 'focus' else np.linspace(0, max(values.max(), 1.0), FOCUS_BIN_COUNT + 1)
+    counts, edges = np.histogram(np.clip(values, bins[0], bins[-1]), bins=bins)
+    summary = {
+        'count': int(len(values)),
+        'mean': round(float(values.mean()), 2),
+        'std': round(float(values.std()), 2),
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'quantiles': {
+            f'p{q}': round(float(v), 2) for q, v in zip(QUANTILES, np.percentile(values, QUANTILES))
+        },
+        'histogram': {'edges': [round(float(e), 2) for e in edges], 'counts': counts.tolist()},
+    }
+    return summary, dict(zip(students, values.tolist()))
+
+
+def course_distribution(course, metric):
+    """
+    Summary (histogram, quantiles, mean/std) of one metric across a course,
+    plus the per-student values needed for percentiles and z-scores.
+    Cached until a write bumps the course's stamp.
+    """
+    key = DATA_KEY.format(course.id, metric, current_stamp(course.id))
+    data = cache.get(key)
+    if data is None:
+        students, values = _LOADERS[metric](course, timezone.now())
+        summary, by_student = _summarize(metric, students, values)
+        data = {'summary': summary, 'values': by_student}
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def standings(data, student_id=None):
+    """
+    Value, percentile rank (share of the class at or below) and z-score for
+    every student, or just one when student_id is given.
+    """
+    if not data['values']:
+        return []
+    students = np.fromiter(data['values'].keys(), dtype=np.int64)
+    values = np.fromiter(data['values'].values(), dtype=np.float64)
+    if student_id is not None:
+        mask = students == student_id
+        if not mask.any():
+            return []
+    ranked = np.sort(values)
+    std = values.std()
+    percentiles = 100.0 * np.searchsorted(ranked, values, side='right') / len(values)
+    z_scores = (values - values.mean()) / std if std > 0 else np.zeros(len(values))
+    if student_id is not None:
+        students, values, percentiles, z_scores = students[mask], values[mask], percentiles[mask], z_scores[mask]
+    return [
+        {'student': s, 'value': round(v, 2), 'percentile': round(p, 1), 'z_score': round(z, 3)}
+        for s, v, p, z in zip(students.tolist(), values.tolist(), percentiles.tolist(), z_scores.tolist())
+    ]
@@ -0,0 +1,120 @@
+import math
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Attendance, Doubt
+from .search import tokenize
+
+
+STAMP_KEY = 'doubt-queue:{}'
+# Score = recency + duplicates + engagement, each term roughly in 0..1
+RECENCY_HALF_LIFE_MINUTES = 10
+DUPLICATE_WEIGHT = 0.8
+ENGAGEMENT_WEIGHT = 0.5
+DUPLICATE_SIMILARITY = 0.6  # Jaccard overlap of question terms
+MAX_SESSIONS = 256  # per-worker LRU of live session queues
+
+_queues = OrderedDict()
+_queues_lock = threading.Lock()
+
+
+def bump(session_id):
+    """Tell every worker that a session's open doubts changed"""
+    cache.set(STAMP_KEY.format(session_id), uuid.uuid4().hex, None)
+
+
+def current_stamp(session_id):
+    key = STAMP_KEY.format(session_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def _similar(a, b):
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= DUPLICATE_SIMILARITY
+
+
+class SessionDoubtQueue:
+    """Open doubts of one session, clustered by similar wording"""
+
+    def __init__(self, session_id, stamp):
+        self.session_id = session_id
+        self.stamp = stamp
+        self.clusters = []
+        self._load()
+
+    def _load(self):
+        doubts = list(
+            Doubt.objects.filter(session_id=self.session_id, status='open')
+            .order_by('asked_at')
+            .values('id', 'student_id', 'question', 'asked_at')
+        )
+        engagement = dict(
+            Attendance.objects.filter(
+                session_id=self.session_id,
+                student_id__in={d['student_id'] for d in doubts},
+            ).values_list('student_id', 'attendance_percentage')
+        )
+
+        for doubt in doubts:
+            doubt['terms'] = frozenset(tokenize(doubt['question']))
+            doubt['engagement'] = min(max(engagement.get(doubt['student_id'], 0.0), 0.0), 100.0) / 100
+            for cluster in self.clusters:
+                if _similar(cluster[0]['terms'], doubt['terms']):
+                    cluster.append(doubt)
+                    break
+            else:
+                self.clusters.append([doubt])
+
+    def snapshot(self, now=None):
+        """Ranked clusters, highest score first; the first doubt represents each cluster"""
+        now = now or timezone.now()
+        ranked = []
+        for cluster in self.clusters:
+            latest = max(d['asked_at'] for d in cluster)
+            age_minutes = max((now - latest).total_seconds(), 0) / 60
+            recency = math.exp(-math.log(2) * age_minutes / RECENCY_HALF_LIFE_MINUTES)
+            duplicates = len(cluster) - 1
+            engagement = max(d['engagement'] for d in cluster)
+            score = (
+                recency
+                + DUPLICATE_WEIGHT * math.log1p(duplicates)
+                + ENGAGEMENT_WEIGHT * engagement
+            )
+            head = cluster[0]
+            ranked.append({
+                'id': head['id'],
+                'question': head['question'],
+                'student': head['student_id'],
+                'asked_at': head['asked_at'],
+                'duplicates': duplicates,
+                'duplicate_ids': [d['id'] for d in cluster[1:]],
+                'score': round(score, 4),
+            })
+        ranked.sort(key=lambda item: item['score'], reverse=True)
+        return {'session': self.session_id, 'version': self.stamp, 'doubts': ranked}
+
+
+def get_queue(session_id):
+    """Return this worker's queue for a session, rebuilding it only when the stamp moved"""
+    stamp = current_stamp(session_id)
+    with _queues_lock:
+        queue = _queues.get(session_id)
+        if queue is not None:
+            _queues.move_to_end(session_id)
+    if queue is None or queue.stamp != stamp:
+        queue = SessionDoubtQueue(session_id, stamp)
+        with _queues_lock:
+            _queues[session_id] = queue
+            _queues.move_to_end(session_id)
+            while len(_queues) > MAX_SESSIONS:
+                _queues.popitem(last=False)
+    return queue
@@ -0,0 +1,98 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+
+from .models import Assignment, Attendance, ClassSession, Enrollment, Submission
+
+
+CHUNK_SIZE = 500  # rows fetched per round trip; a server-side cursor on PostgreSQL
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def _pivot(course, columns, model, column_field, value_field):
+    """
+    One row per active enrollment with a correlated subquery per column.
+    Each subquery is a unique-index lookup on (student, column), so the
+    database pivots without a GROUP BY and rows stream as they are produced.
+    """
+    annotations = {
+        f'c{column_id}': Subquery(
+            model.objects.filter(student_id=OuterRef('student_id'), **{column_field: column_id})
+            .values(value_field)[:1]
+        )
+        for column_id, _ in columns
+    }
+    return (
+        Enrollment.objects.filter(course=course, status='active')
+        .order_by('student__username')
+        .annotate(**annotations)
+        .values_list(
+            'student_id', 'student__username', 'student__first_name', 'student__last_name',
+            *annotations,
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def gradebook_columns(course):
+    return list(
+        Assignment.objects.filter(course=course).order_by('due_date', 'id').values_list('id', 'title')
+    )
+
+
+def attendance_columns(course):
+    return [
+        (session_id, f'{when:%Y-%m-%d %H:%M} {topic}')
+        for session_id, when, topic in ClassSession.objects.filter(course=course)
+        .order_by('session_date', 'id').values_list('id', 'session_date', 'topic')
+    ]
+
+
+def gradebook_rows(course, columns):
+    return _pivot(course, columns, Submission, 'assignment_id', 'score')
+
+
+def attendance_rows(course, columns):
+    return _pivot(course, columns, Attendance, 'session_id', 'status')
+
+
+def csv_cell(value):
+    """A cell value that a spreadsheet shows as text, never evaluates"""
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, rows):
+    """Yield CSV lines: header, then one line per student"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['student_id', 'username', 'name', *[csv_cell(label) for _, label in columns]])
+    for student_id, username, first, last, *cells in rows:
+        yield writer.writerow([
+            student_id, csv_cell(username), csv_cell(f'{first} {last}'.strip()),
+            *[csv_cell(cell) for cell in cells],
+        ])
+
+
+def stream_jsonl(columns, rows, key):
+    """Yield one JSON object per student; `key` names the per-column mapping"""
+    ids = [str(column_id) for column_id, _ in columns]
+    for student_id, username, first, last, *cells in rows:
+        yield json.dumps({
+            'student': student_id,
+            'username': username,
+            'name': f'{first} {last}'.strip(),
+            key: dict(zip(ids, cells)),
+        }, cls=DjangoJSONEncoder) + '\n'
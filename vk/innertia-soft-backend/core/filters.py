@@ -6,6 +6,7 @@ from .models import (
     FocusLog, Violation, Slide, Note, Doubt, DoubtResponse, Assignment,
     Submission, StudentPerformance
 )
+from .search import search_notes, filter_by_tags
 
 
 class CollegeFilter(django_filters.FilterSet):
@@ -160,17 +161,19 @@ class SlideFilter(django_filters.FilterSet):
 
 class NoteFilter(django_filters.FilterSet):
     search = django_filters.CharFilter(method='filter_search')
+    tags = django_filters.CharFilter(method='filter_tags')  # comma-separated, all must match
     is_public = django_filters.BooleanFilter()
     
     class Meta:
         model = Note
-        fields = ['student', 'is_public']
+        fields = ['student', 'session', 'is_public']
     
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__icontains=value) | 
-            Q(content__icontains=value)
-        )
+        # Ranked lookup against the note_search_terms index
+        return search_notes(queryset, value)
+    
+    def filter_tags(self, queryset, name, value):
+        return filter_by_tags(queryset, value.split(','))
 
 
 class DoubtFilter(django_filters.FilterSet):
@@ -187,10 +190,7 @@ class DoubtFilter(django_filters.FilterSet):
         fields = ['student', 'session', 'status']
     
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(question__icontains=value) | 
-            Q(subject__icontains=value)
-        )
+        return queryset.filter(question__icontains=value)
 
 
 class AssignmentFilter(django_filters.FilterSet):
@@ -226,11 +226,17 @@ class SubmissionFilter(django_filters.FilterSet):
         ('graded', 'Graded'),
         ('late', 'Late Submission'),
         ('draft', 'Draft'),
-    ])
+    ], method='filter_status')
     
     class Meta:
         model = Submission
-        fields = ['student', 'assignment', 'status']
+        fields = ['student', 'assignment', 'status', 'is_late']
+    
+    def filter_status(self, queryset, name, value):
+        # Lateness is its own flag now; ?status=late keeps working
+        if value == 'late':
+            return queryset.filter(is_late=True)
+        return queryset.filter(status=value)
 
 
 class StudentPerformanceFilter(django_filters.FilterSet):
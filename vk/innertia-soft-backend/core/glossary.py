@@ -0,0 +1,132 @@
+import hashlib
+import re
+
+from django.db import transaction
+
+from .models import ClassSession, SlideTerm, SlideQuestion
+
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return _whitespace.sub(' ', str(value)).strip().lower().rstrip('.:;,?!')
+
+
+def question_key(question):
+    return hashlib.sha256(normalize_text(question).encode()).hexdigest()
+
+
+def _parse_definitions(definitions):
+    """
+    Accept the shapes ai_definitions is stored in: plain strings,
+    {"term": ..., "definition": ...} objects, or a {term: definition} mapping.
+    """
+    if isinstance(definitions, dict):
+        definitions = [{'term': k, 'definition': v} for k, v in definitions.items()]
+    for item in definitions or []:
+        if isinstance(item, dict):
+            term = item.get('term') or item.get('name') or ''
+            definition = item.get('definition') or item.get('meaning') or ''
+        else:
+            term, definition = item, ''
+        term = str(term).strip()
+        if term:
+            yield term[:255], str(definition)
+
+
+def _parse_questions(questions):
+    for item in questions or []:
+        if isinstance(item, dict):
+            item = item.get('question') or ''
+        item = str(item).strip()
+        if item:
+            yield item
+
+
+def index_slide(slide, course_id=None):
+    """Replace the term and question index rows for a single slide"""
+    if course_id is None:
+        course_id = ClassSession.objects.values_list('course_id', flat=True).get(pk=slide.session_id)
+
+    terms = {}
+    for term, definition in _parse_definitions(slide.ai_definitions):
+        terms.setdefault(normalize_text(term)[:255], (term, definition))
+    questions = {}
+    for question in _parse_questions(slide.ai_questions):
+        questions.setdefault(question_key(question), question)
+
+    with transaction.atomic():
+        SlideTerm.objects.filter(slide=slide).delete()
+        SlideQuestion.objects.filter(slide=slide).delete()
+        SlideTerm.objects.bulk_create([
+            SlideTerm(slide=slide, course_id=course_id, term=term,
+                      normalized_term=normalized, definition=definition)
+            for normalized, (term, definition) in terms.items()
+        ])
+        SlideQuestion.objects.bulk_create([
+            SlideQuestion(slide=slide, course_id=course_id, question=question, question_key=key)
+            for key, question in questions.items()
+        ])
+
+
+def rebuild_index(slides):
+    """Re-index every slide in a queryset; returns the number processed"""
+    count = 0
+    for slide in slides.select_related('session').iterator():
+        index_slide(slide, course_id=slide.session.course_id)
+        count += 1
+    return count
+
+
+def course_glossary(course, term=None):
+    """Group a course's indexed terms, with the slides defining each, in one query"""
+    rows = SlideTerm.objects.filter(course=course)
+    if term:
+        rows = rows.filter(normalized_term=normalize_text(term))
+    rows = rows.order_by('normalized_term', 'slide__session__session_date', 'slide__slide_number').values(
+        'normalized_term', 'term', 'definition', 'slide_id', 'slide__slide_number',
+        'slide__title', 'slide__session_id',
+    )
+
+    glossary = []
+    for row in rows:
+        if not glossary or glossary[-1]['key'] != row['normalized_term']:
+            glossary.append({
+                'key': row['normalized_term'],
+                'term': row['term'],
+                'definition': row['definition'],
+                'slides': [],
+            })
+        entry = glossary[-1]
+        if not entry['definition'] and row['definition']:
+            entry['definition'] = row['definition']
+        entry['slides'].append({
+            'id': row['slide_id'],
+            'session': row['slide__session_id'],
+            'slide_number': row['slide__slide_number'],
+            'title': row['slide__title'],
+        })
+    return glossary
+
+
+def course_question_bank(course):
+    """Deduplicated probable-exam questions for a course, in one query"""
+    rows = SlideQuestion.objects.filter(course=course).order_by(
+        'question_key', 'slide__session__session_date', 'slide__slide_number'
+    ).values('question_key', 'question', 'slide_id', 'slide__session_id', 'slide__slide_number')
+
+    bank = []
+    for row in rows:
+        if not bank or bank[-1]['key'] != row['question_key']:
+            bank.append({'key': row['question_key'], 'question': row['question'], 'slides': []})
+        bank[-1]['slides'].append({
+            'id': row['slide_id'],
+            'session': row['slide__session_id'],
+            'slide_number': row['slide__slide_number'],
+        })
+    for entry in bank:
+        entry['occurrences'] = len(entry['slides'])
+    bank.sort(key=lambda entry: (-entry['occurrences'], entry['question'].lower()))
+    return bank
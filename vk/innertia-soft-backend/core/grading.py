@@ -0,0 +1,112 @@
+import csv
+import io
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import distributions
+from .models import Submission
+
+
+def read_csv_rows(upload):
+    """Yield dict rows from an uploaded CSV with a header line"""
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text):
+            yield {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+    finally:
+        text.detach()
+
+
+ROW_KEYS = (
+    ('submission', ('submission', 'submission_id', 'id')),
+    ('student', ('student', 'student_id')),
+    ('username', ('username',)),
+)
+
+
+def _row_key(row):
+    """Pick the submission identifier out of a row: submission id, student id or username"""
+    for kind, fields in ROW_KEYS:
+        for field in fields:
+            value = row.get(field)
+            if value not in (None, ''):
+                return kind, str(value)
+    return None, None
+
+
+def bulk_grade(assignment, rows, partial=False):
+    """
+    Validate every row against the assignment in one pass, then grade all
+    matching submissions with a single bulk_update.
+
+    Unless partial is set, any invalid row means nothing is written.
+    Returns (graded_count, errors) where errors is [{"row": n, "errors": [...]}].
+    """
+    submissions = list(
+        Submission.objects.filter(assignment=assignment)
+        .select_related('student')
+        .only('id', 'score', 'feedback', 'status', 'graded_at', 'student__id', 'student__username')
+    )
+    # Ids and usernames are looked up apart: a numeric username is not an id
+    lookups = {
+        'submission': {str(s.id): s for s in submissions},
+        'student': {str(s.student.id): s for s in submissions},
+        'username': {s.student.username.lower(): s for s in submissions},
+    }
+
+    now = timezone.now()
+    errors = []
+    seen = {}
+    to_update = []
+
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'errors': ['Row must be an object']})
+            continue
+        row_errors = []
+
+        kind, value = _row_key(row)
+        submission = lookups[kind].get(value.lower()) if kind else None
+        if kind is None:
+            row_errors.append('One of submission, student or username is required')
+        elif submission is None:
+            row_errors.append(f'No submission for {kind} {value} in this assignment')
+        elif submission.id in seen:
+            row_errors.append(f'Duplicate of row {seen[submission.id]}')
+
+        score = row.get('score')
+        try:
+            score = float(score)
+            if not math.isfinite(score):
+                raise ValueError
+        except (TypeError, ValueError):
+            row_errors.append('Score must be a number')
+        else:
+            if not (0 <= score <= assignment.max_score):
+                row_errors.append(f'Score must be between 0 and {assignment.max_score:g}')
+
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+            continue
+
+        seen[submission.id] = number
+        submission.score = score
+        feedback = row.get('feedback')
+        if feedback is not None:
+            submission.feedback = str(feedback)
+        submission.status = 'graded'
+        submission.graded_at = now
+        to_update.append(submission)
+
+    if errors and not partial:
+        return 0, errors
+
+    with transaction.atomic():
+        Submission.objects.bulk_update(
+            to_update, ['score', 'feedback', 'status', 'graded_at'], batch_size=500
+        )
+        # bulk_update sends no signals, so invalidate the course statistics here
+        transaction.on_commit(lambda: distributions.bump(assignment.course_id))
+    return len(to_update), errors
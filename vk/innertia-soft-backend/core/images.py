@@ -0,0 +1,117 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Source digests keyed by (path, size, mtime) so repeat requests skip re-hashing
+DIGEST_KEY = 'image-digest:{}'
+DIGEST_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # The key changes with the file, so this only bounds the cache
+# Fixed pool: generating two variants that share a stripe only serialises them
+LOCK_STRIPES = 64
+_generation_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+class DerivativeError(Exception):
+    """Raised when a derivative cannot be produced from the source file."""
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return hashlib.blake2b(f'{path}|{stat.st_size}|{stat.st_mtime_ns}'.encode(), digest_size=16).hexdigest()
+
+
+def _source_digest(path):
+    key = DIGEST_KEY.format(_stat_key(path))
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.set(key, digest, DIGEST_CACHE_TIMEOUT)
+    return digest
+
+
+def _lock_for(key):
+    return _generation_locks[int(hashlib.blake2b(key.encode(), digest_size=8).hexdigest(), 16) % LOCK_STRIPES]
+
+
+def source_version(field_file):
+    """
+    Short tag that changes whenever the stored file does (name, size or
+    mtime), without reading it; used as `v` in derivative URLs.
+    """
+    try:
+        return _stat_key(field_file.path)[:8]
+    except (NotImplementedError, OSError):  # Remote storage or a missing file
+        return hashlib.md5(field_file.name.encode()).hexdigest()[:8]
+
+
+def nearest_width(requested):
+    """Snap a requested width to the closest configured derivative width."""
+    widths = settings.IMAGE_DERIVATIVE_WIDTHS
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return widths[0]
+    for width in widths:
+        if width >= requested:
+            return width
+    return widths[-1]
+
+
+def get_derivative(field_file, width):
+    """
+    Return (path, etag) of a resized JPEG variant of an image FileField.
+
+    Variants are keyed by the SHA-256 of the source bytes plus width and
+    quality, so each one is generated once and reused until the source changes.
+    """
+    if not field_file:
+        raise DerivativeError('No image uploaded')
+
+    source_path = field_file.path
+    if not os.path.exists(source_path):
+        raise DerivativeError('Image file is missing')
+
+    quality = settings.IMAGE_DERIVATIVE_QUALITY
+    etag = f'{_source_digest(source_path)}-w{width}-q{quality}'
+    target_dir = os.path.join(settings.IMAGE_DERIVATIVE_ROOT, etag[:2])
+    target_path = os.path.join(target_dir, f'{etag}.jpg')
+
+    if os.path.exists(target_path):
+        return target_path, etag
+
+    with _lock_for(etag):
+        # Another thread may have produced it while we waited for the lock
+        if os.path.exists(target_path):
+            return target_path, etag
+
+        try:
+            with Image.open(source_path) as img:
+                img = ImageOps.exif_transpose(img)
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                # thumbnail() never upscales and preserves the aspect ratio
+                img.thumbnail((width, width * 4), Image.LANCZOS)
+
+                os.makedirs(target_dir, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+                    os.replace(tmp_path, target_path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as exc:
+            raise DerivativeError(f'File is not a readable image: {exc}')
+
+    return target_path, etag
@@ -0,0 +1,193 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .locks import cache_lock
+from .models import ClassSession, Enrollment, FocusLog, ScreenLock, Violation
+
+
+ROSTER_KEY = 'live-session:{}'
+ENTRY_KEY = 'live-session:{}:{}'
+VERSION_KEY = 'live-session-version:{}'
+LOCK_KEY = 'live-session-lock:{}'
+ENTRY_LOCK_KEY = 'live-session-lock:{}:{}'
+ENTRY_LOCK_WAIT = 1  # seconds; only events of the same student contend
+STATE_TIMEOUT = 60 * 60 * 12
+FOCUSED_EVENTS = {'focus_gained'}
+# A version is taken just before its entry is written, so a reader can see
+# version N while N-1 is still landing; deltas re-send this many versions
+REPLAY_VERSIONS = 100
+
+
+def _entry(student_id, username):
+    return {
+        'student': student_id,
+        'username': username,
+        'focused': None,  # Unknown until the first focus event
+        'locked': False,
+        'open_violations': [],
+        'last_event': None,
+        'last_heartbeat': None,
+        'version': 0,
+    }
+
+
+def _build(session):
+    """
+    Load the current state of every enrolled student from the database.
+
+    Every entry gets the same fresh version taken from the clock, so a
+    client holding a version from before an eviction receives everything.
+    """
+    latest = FocusLog.objects.filter(session=session, student_id=OuterRef('student_id')).order_by('-timestamp')
+    students = {}
+    for student_id, username, event, at in (
+        Enrollment.objects.filter(course_id=session.course_id, status='active')
+        .annotate(event=Subquery(latest.values('event_type')[:1]),
+                  at=Subquery(latest.values('timestamp')[:1]))
+        .values_list('student_id', 'student__username', 'event', 'at')
+    ):
+        entry = students[student_id] = _entry(student_id, username)
+        if event:
+            entry['focused'] = event in FOCUSED_EVENTS
+            entry['last_event'] = {'type': event, 'at': at.isoformat()}
+            entry['last_heartbeat'] = at.isoformat()
+
+    for student_id in ScreenLock.objects.filter(session=session, is_locked=True).values_list('student_id', flat=True):
+        if student_id in students:
+            students[student_id]['locked'] = True
+    for student_id, violation_id in Violation.objects.filter(session=session, is_resolved=False) \
+            .values_list('student_id', 'id'):
+        if student_id in students:
+            students[student_id]['open_violations'].append(violation_id)
+
+    version = int(time.time() * 1000)
+    for entry in students.values():
+        entry['version'] = version
+    roster = {'session': session.id, 'faculty': session.faculty_id, 'students': list(students)}
+    cache.set_many({ENTRY_KEY.format(session.id, pk): entry for pk, entry in students.items()}, STATE_TIMEOUT)
+    cache.set(VERSION_KEY.format(session.id), version, STATE_TIMEOUT)
+    # Written last: a roster in the cache means its entries were stored
+    cache.set(ROSTER_KEY.format(session.id), roster, STATE_TIMEOUT)
+    return roster
+
+
+def get_state(session_id, build=True, rebuild=False):
+    """
+    Return the session's roster (session, faculty, student ids), loading
+    the state from the database on first use or when `rebuild` is set.
+    Each student's entry is a cache key of its own, so an event rewrites
+    one small value whatever the class size.
+    """
+    state = None if rebuild else cache.get(ROSTER_KEY.format(session_id))
+    if state is None and build:
+        with cache_lock(LOCK_KEY.format(session_id)):
+            state = None if rebuild else cache.get(ROSTER_KEY.format(session_id))
+            if state is None:
+                session = ClassSession.objects.filter(pk=session_id).first()
+                if session is None:
+                    return None
+                state = _build(session)
+    return state
+
+
+def _update(session_id, student_id, change):
+    """
+    Apply change(entry) to one student under that student's lock and give
+    it the next version. States that nobody has loaded are left alone; they
+    are built fresh on first read.
+    """
+    key = ENTRY_KEY.format(session_id, student_id)
+    if not cache.has_key(key):
+        return False
+    with cache_lock(ENTRY_LOCK_KEY.format(session_id, student_id), timeout=ENTRY_LOCK_WAIT):
+        entry = cache.get(key)
+        if entry is None:
+            return False
+        change(entry)
+        try:
+            entry['version'] = cache.incr(VERSION_KEY.format(session_id))
+        except ValueError:
+            return False  # Counter evicted; the next read rebuilds the state
+        cache.set(key, entry, STATE_TIMEOUT)
+    return True
+
+
+def record_focus(session_id, student_id, event_type, at):
+    def change(entry):
+        entry['focused'] = event_type in FOCUSED_EVENTS
+        entry['last_event'] = {'type': event_type, 'at': at.isoformat()}
+        entry['last_heartbeat'] = at.isoformat()
+    return _update(session_id, student_id, change)
+
+
+def record_lock(session_id, student_id, locked):
+    def change(entry):
+        entry['locked'] = locked
+    return _update(session_id, student_id, change)
+
+
+def record_violation(session_id, student_id, violation_id, is_open):
+    def change(entry):
+        ids = set(entry['open_violations'])
+        if is_open:
+            ids.add(violation_id)
+        else:
+            ids.discard(violation_id)
+        entry['open_violations'] = sorted(ids)
+    return _update(session_id, student_id, change)
+
+
+def heartbeat(session_id, student_id):
+    """
+    Record that a student's client is alive. Touches only the store; a
+    student missing from the roster is looked up once in case they enrolled
+    after the state was built. Returns False for students not enrolled.
+    """
+    state = get_state(session_id)
+    if state is None:
+        return False
+    if student_id not in state['students']:
+        username = Enrollment.objects.filter(
+            course__sessions=session_id, student_id=student_id, status='active',
+        ).values_list('student__username', flat=True).first()
+        if username is None:
+            return False
+        with cache_lock(LOCK_KEY.format(session_id)):
+            state = cache.get(ROSTER_KEY.format(session_id))
+            if state is not None and student_id not in state['students']:
+                cache.add(ENTRY_KEY.format(session_id, student_id), _entry(student_id, username), STATE_TIMEOUT)
+                state['students'].append(student_id)
+                cache.set(ROSTER_KEY.format(session_id), state, STATE_TIMEOUT)
+    now = timezone.now().isoformat()
+
+    def change(entry):
+        entry['last_heartbeat'] = now
+    return _update(session_id, student_id, change)
+
+
+def snapshot(state, since=0):
+    """
+    Students whose entry changed after version `since` (all of them when
+    since is 0). A state that was partly evicted is rebuilt and sent whole.
+    """
+    session_id = state['session']
+    for attempt in range(2):
+        keys = [ENTRY_KEY.format(session_id, pk) for pk in state['students']]
+        version = cache.get(VERSION_KEY.format(session_id))
+        found = cache.get_many(keys)
+        if version is not None and len(found) == len(keys):
+            break
+        state, since = get_state(session_id, rebuild=True), 0
+        if state is None:
+            return {'session': session_id, 'version': version, 'full': True, 'students': []}
+    entries = [found[key] for key in keys if key in found]
+    students = [entry for entry in entries if not since or entry['version'] > since - REPLAY_VERSIONS]
+    return {
+        'session': session_id,
+        'version': version,
+        'full': len(students) == len(entries),
+        'students': students,
+    }
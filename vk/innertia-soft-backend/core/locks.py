@@ -0,0 +1,25 @@
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+@contextmanager
+def cache_lock(key, timeout=5):
+    """
+    Cross-worker mutex built on the cache's atomic add(). The value is a
+    token of this holder, so a holder that outlived the timeout does not
+    release a lock another worker has since taken.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while not cache.add(key, token, timeout):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Could not acquire lock {key}')
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
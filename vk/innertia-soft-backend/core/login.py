@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+User = get_user_model()
+
+_executor = None
+_slots = None
+_setup_lock = threading.Lock()
+
+
+class LoginBusy(APIException):
+    """Every hashing worker is busy and the wait queue is full"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress; retry shortly.'
+    default_code = 'login_busy'
+    wait = 2  # Sent as Retry-After
+
+
+def _pool():
+    global _executor, _slots
+    if _executor is None:
+        with _setup_lock:
+            if _executor is None:
+                workers = settings.LOGIN_HASH_WORKERS
+                _slots = threading.BoundedSemaphore(workers + settings.LOGIN_HASH_QUEUE)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login-hash')
+    return _executor, _slots
+
+
+def run_hashing(fn, *args):
+    """
+    Run a password hashing call on the login pool and wait for the result.
+
+    hashlib releases the GIL while hashing, so the pool uses that many cores
+    and no more; request threads only wait. Raises LoginBusy straight away
+    when the workers and the queue behind them are full, or after
+    LOGIN_HASH_TIMEOUT seconds in the queue.
+    """
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+    try:
+        return future.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()  # Frees the slot if it never started
+        raise LoginBusy()
+
+
+def _verify(password, encoded):
+    """(valid, new_encoded); new_encoded is set when the hash should be upgraded"""
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+
+def verify_password(password, encoded):
+    return run_hashing(_verify, password, encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that hashes on the login pool. A password stored with an
+    older hasher (or fewer iterations) than PASSWORD_HASHERS[0] is rehashed
+    on the same pool after a successful login; only the save happens here.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            run_hashing(make_password, password)
+            return None
+        valid, rehashed = verify_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+        if rehashed:
+            user.password = rehashed
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management.base import BaseCommand
+from core.login import verify_password
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure password-verification throughput (logins per second per core) with and without '
+        'the login pool, using the same hasher on both sides'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=100, help='Logins to verify per run')
+        parser.add_argument('--clients', type=int, default=32, help='Concurrent login requests')
+        parser.add_argument('--workers', type=int, help='Login pool size (default LOGIN_HASH_WORKERS)')
+        parser.add_argument('--hasher', help='Hasher algorithm for both runs (default PASSWORD_HASHERS[0])')
+        parser.add_argument('--baseline', default='pbkdf2_sha256',
+                            help='Older hasher whose hashes should be upgraded on login')
+
+    def handle(self, *args, **options):
+        if options['workers']:
+            settings.LOGIN_HASH_WORKERS = options['workers']
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        password = 'benchmark-password'
+        algorithm = options['hasher'] or get_hasher().algorithm
+        encoded = make_password(password, hasher=algorithm)
+
+        # Before: the stock view verifies inline, one request thread per login
+        rate = self._run(options, lambda: check_password(password, encoded))
+        self._report(f'before ({algorithm}, inline)', rate, min(options['clients'], cores))
+
+        # After: the same hasher on the bounded pool
+        workers = min(settings.LOGIN_HASH_WORKERS, cores)
+        rate = self._run(options, lambda: verify_password(password, encoded)[0])
+        self._report(f'after ({algorithm}, pool of {settings.LOGIN_HASH_WORKERS})', rate, workers)
+
+        baseline = make_password(password, hasher=options['baseline'])
+        valid, rehashed = verify_password(password, baseline)
+        upgraded = rehashed is not None and get_hasher().algorithm != options['baseline']
+        self.stdout.write(f'rehash on login from {options["baseline"]}: {"yes" if valid and upgraded else "no"}')
+
+    def _run(self, options, login):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clients']) as clients:
+            results = list(clients.map(lambda _: login(), range(options['logins'])))
+        elapsed = time.perf_counter() - started
+        assert all(results)
+        return options['logins'] / elapsed
+
+    def _report(self, label, rate, cores):
+        self.stdout.write(f'{label}: {rate:.1f} logins/s, {rate / cores:.1f} logins/s per core')
@@ -0,0 +1,126 @@
+import gzip
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import brotli
+from core.models import Attendance, ClassSession, Doubt, DoubtResponse, Slide, User
+from core.renderers import FastJSONRenderer, orjson
+from core.serializers import AttendanceSerializer, DoubtSerializer, SlideSerializer
+
+
+LOREM = (
+    'Object-oriented programming organises software around objects that bundle state '
+    'and behaviour; inheritance and polymorphism let related classes share an interface. '
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure JSON rendering time and compressed size of the largest list payloads, stock vs fast renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed renders per renderer (median is shown)')
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Use generated rows even when the database has enough (repetitive text, so '
+                                 'compression ratios come out higher than on real data)')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; the fast renderer falls back to stock'))
+        rows = options['rows']
+        payloads = {
+            'slides (/slides/?session=)': (SlideSerializer, Slide.objects.all(), self._slides),
+            'attendance (/sessions/{id}/attendance_report/)': (
+                AttendanceSerializer, Attendance.objects.select_related('student', 'session'), self._attendance,
+            ),
+            'doubts (/doubts/?session=)': (
+                DoubtSerializer, Doubt.objects.select_related('student', 'response__source_slide'), self._doubts,
+            ),
+        }
+        for label, (serializer_class, queryset, generate) in payloads.items():
+            instances = None if options['synthetic'] else list(queryset[:rows])
+            source = 'database'
+            if not instances or len(instances) < rows:
+                instances, source = generate(rows), 'synthetic'
+            data = serializer_class(instances, many=True).data
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label}: {len(instances)} {source} rows'))
+            self._compare(data, options['repeat'])
+
+    def _compare(self, data, repeat):
+        stock, stock_body = self._time(JSONRenderer(), data, repeat)
+        fast, fast_body = self._time(FastJSONRenderer(), data, repeat)
+        self.stdout.write(f'  stock JSONRenderer: {stock * 1000:.2f} ms, {len(stock_body)} bytes')
+        self.stdout.write(
+            f'  FastJSONRenderer:   {fast * 1000:.2f} ms, {len(fast_body)} bytes '
+            f'({stock / fast:.1f}x faster, {(stock - fast) * 1000:.2f} ms saved per response)'
+        )
+        self._compression('gzip', lambda body: gzip.compress(body, compresslevel=6, mtime=0), fast_body)
+        if brotli is not None:
+            self._compression('br', lambda body: brotli.compress(body, quality=4), fast_body)
+
+    def _compression(self, name, compress, body):
+        started = time.perf_counter()
+        compressed = compress(body)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  {name:<4} {len(compressed)} bytes ({len(compressed) / len(body):.0%} of raw) in {elapsed * 1000:.2f} ms'
+        )
+
+    def _time(self, renderer, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = renderer.render(data, 'application/json', {})
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), body
+
+    # Unsaved instances shaped like real rows, for an empty database
+
+    def _session(self):
+        return ClassSession(id=1, topic='Introduction to Object-Oriented Programming')
+
+    def _student(self, i):
+        return User(id=1000 + i, username=f'student{i}', first_name='Student', last_name=f'Number {i}', role='student')
+
+    def _slides(self, rows):
+        now = timezone.now()
+        return [
+            Slide(
+                id=i, session_id=1, slide_number=i, title=f'Slide {i}: Classes and Objects',
+                content=LOREM * 20, ai_summary=LOREM * 3,
+                ai_definitions=[{'term': f'Term {n}', 'definition': LOREM} for n in range(5)],
+                ai_questions=[f'Explain concept {n} with an example.' for n in range(5)],
+                created_at=now,
+            )
+            for i in range(1, rows + 1)
+        ]
+
+    def _attendance(self, rows):
+        now, session = timezone.now(), self._session()
+        return [
+            Attendance(
+                id=i, student=self._student(i), session=session, status='present',
+                active_minutes=48, total_minutes=55, attendance_percentage=87.27,
+                check_in_time=now - timedelta(minutes=55), check_out_time=now, recorded_at=now,
+            )
+            for i in range(1, rows + 1)
+        ]
+
+    def _doubts(self, rows):
+        now, session = timezone.now(), self._session()
+        doubts = []
+        for i in range(1, rows + 1):
+            doubt = Doubt(
+                id=i, student=self._student(i), session=session, question=LOREM * 2,
+                status='resolved', asked_at=now, resolved_at=now,
+            )
+            doubt.response = DoubtResponse(
+                id=i, doubt=doubt, answer=LOREM * 4, source_snippet=LOREM, confidence_score=0.82, responded_at=now,
+            )
+            doubts.append(doubt)
+        return doubts
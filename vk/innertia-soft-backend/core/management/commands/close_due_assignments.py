@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.deadlines import close_due_assignments
+
+
+class Command(BaseCommand):
+    help = 'Close published assignments past their due date and mark late submissions (run every few minutes)'
+
+    def handle(self, *args, **options):
+        closed, late = close_due_assignments()
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} assignments, marked {late} submissions late'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.autosave import flush_all
+
+
+class Command(BaseCommand):
+    help = 'Write buffered note autosaves to the database (run every minute or so)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=float,
+            default=None,
+            help='Only flush buffers idle for at least this many seconds (default: NOTE_AUTOSAVE_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        flushed = flush_all(max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} notes'))
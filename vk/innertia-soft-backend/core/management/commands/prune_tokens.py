@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.token_blacklist import prune_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens and their blacklist rows (run hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        deleted = prune_expired(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} expired tokens'))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import Upload
+from core.uploads import discard_part, prune_chunks
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that were never completed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=48,
+            help='Remove pending uploads idle for longer than this (default: 48)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = Upload.objects.filter(status='pending', updated_at__lt=cutoff)
+
+        count = 0
+        for upload in stale.iterator():
+            discard_part(upload)
+            count += 1
+        stale.delete()
+        chunks = prune_chunks(cutoff.timestamp())
+        self.stdout.write(self.style.SUCCESS(f'Pruned {count} stale uploads and {chunks} orphaned chunks'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.models import Submission, CompilerSubmission
+from core.similarity import index_submission, index_compiler_submission
+
+
+class Command(BaseCommand):
+    help = 'Rebuild plagiarism fingerprints for submissions and compiler submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            help='Only re-index submissions of this assignment id',
+        )
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.only('id', 'assignment_id', 'content')
+        if options['assignment']:
+            submissions = submissions.filter(assignment_id=options['assignment'])
+
+        count = 0
+        for submission in submissions.iterator():
+            index_submission(submission)
+            count += 1
+
+        if not options['assignment']:
+            for code in CompilerSubmission.objects.only('id', 'session_id', 'code').iterator():
+                index_compiler_submission(code)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Fingerprinted {count} documents'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.models import Note
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the note tag and full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            type=int,
+            help='Only re-index notes written by this student id',
+        )
+
+    def handle(self, *args, **options):
+        notes = Note.objects.all()
+        if options['student']:
+            notes = notes.filter(student_id=options['student'])
+
+        count = rebuild_index(notes)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} notes'))
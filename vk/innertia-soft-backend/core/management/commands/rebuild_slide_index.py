@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.models import Slide
+from core.glossary import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the glossary and question-bank index from Slide.ai_definitions / ai_questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=int,
+            help='Only re-index slides belonging to this course id',
+        )
+
+    def handle(self, *args, **options):
+        slides = Slide.objects.all()
+        if options['course']:
+            slides = slides.filter(session__course_id=options['course'])
+
+        count = rebuild_index(slides)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} slides'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.models import Course
+from core.performance import recompute
+
+
+class Command(BaseCommand):
+    help = 'Recompute StudentPerformance metrics and at-risk scores (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--college', type=int, help='Only courses of this college id')
+        parser.add_argument('--course', type=int, help='Only this course id')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['college']:
+            courses = courses.filter(program__college_id=options['college'])
+        if options['course']:
+            courses = courses.filter(id=options['course'])
+
+        started = time.monotonic()
+        count = recompute(courses)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {count} performance records in {elapsed:.1f}s'))
@@ -0,0 +1,53 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are only gzipped
+    brotli = None
+
+
+ACCEPTS_BR = re.compile(r'\bbr\b')
+COMPRESSIBLE_TYPES = ('application/json', 'application/jsonl', 'application/javascript', 'text/')
+# Each event has to reach the client as soon as it is written
+UNBUFFERED_TYPES = ('text/event-stream',)
+
+
+def compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNBUFFERED_TYPES)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress JSON and text responses of at least COMPRESSION_MIN_SIZE bytes:
+    Brotli when the client accepts it and brotli is installed, gzip
+    otherwise. Streamed exports are gzipped chunk by chunk. Images, columnar
+    files and anything already encoded are passed through.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not compressible(response.get('Content-Type', '')):
+            return response
+        if response.streaming:
+            return super().process_response(request, response)
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if brotli is None or not ACCEPTS_BR.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Same as GZipMiddleware: a strong ETag no longer matches these bytes
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
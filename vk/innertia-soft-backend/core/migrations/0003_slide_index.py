@@ -0,0 +1,45 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_screenlock_compilersubmission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlideTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=255)),
+                ('normalized_term', models.CharField(max_length=255)),
+                ('definition', models.TextField(blank=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slide_terms', to='core.course')),
+                ('slide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='core.slide')),
+            ],
+            options={
+                'db_table': 'slide_terms',
+                'indexes': [models.Index(fields=['course', 'normalized_term'], name='slide_terms_course__1b0541_idx')],
+                'unique_together': {('slide', 'normalized_term')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SlideQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.TextField()),
+                ('question_key', models.CharField(max_length=64)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slide_questions', to='core.course')),
+                ('slide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='core.slide')),
+            ],
+            options={
+                'db_table': 'slide_questions',
+                'indexes': [models.Index(fields=['course', 'question_key'], name='slide_quest_course__5ac701_idx')],
+                'unique_together': {('slide', 'question_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_slide_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.IntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'note_search_terms',
+            },
+        ),
+        migrations.CreateModel(
+            name='NoteTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+            ],
+            options={
+                'db_table': 'note_tags',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['student', '-created_at'], name='notes_student_10d4d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['is_public', '-created_at'], name='notes_is_publ_4f0fac_idx'),
+        ),
+        migrations.AddField(
+            model_name='notetag',
+            name='note',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_index', to='core.note'),
+        ),
+        migrations.AddField(
+            model_name='notesearchterm',
+            name='note',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.note'),
+        ),
+        migrations.AddIndex(
+            model_name='notetag',
+            index=models.Index(fields=['tag', 'note'], name='note_tags_tag_98de18_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notetag',
+            unique_together={('note', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='notesearchterm',
+            index=models.Index(fields=['term', 'note'], name='note_search_term_2aac3c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notesearchterm',
+            unique_together={('note', 'term')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('assignment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='core.assignment')),
+                ('compiler_submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='core.compilersubmission')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='core.classsession')),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='core.submission')),
+            ],
+            options={
+                'db_table': 'fingerprints',
+                'indexes': [models.Index(fields=['assignment', 'hash'], name='fingerprint_assignm_25ad51_idx'), models.Index(fields=['session', 'hash'], name='fingerprint_session_131307_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['status', 'due_date'], name='assignments_status_e6d24c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'status'], name='submissions_assignm_0c8ffa_idx'),
+        ),
+    ]
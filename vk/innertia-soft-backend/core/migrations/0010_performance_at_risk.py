@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_export_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentperformance',
+            name='at_risk_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='studentperformance',
+            name='missing_submissions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='studentperformance',
+            name='student',
+            field=models.ForeignKey(limit_choices_to={'role': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='performance', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='studentperformance',
+            index=models.Index(fields=['course', '-at_risk_score'], name='student_per_course__352148_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+def move_late_status(apps, schema_editor):
+    Submission = apps.get_model('core', 'Submission')
+    Submission.objects.filter(status='late', score__isnull=True).update(status='submitted', is_late=True)
+    Submission.objects.filter(status='late').update(status='graded', is_late=True)
+
+
+def restore_late_status(apps, schema_editor):
+    Submission = apps.get_model('core', 'Submission')
+    Submission.objects.filter(is_late=True, status='submitted').update(status='late')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_claims_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='is_late',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(move_late_status, restore_late_status),
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('submitted', 'Submitted'), ('graded', 'Graded')], default='submitted', max_length=20),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
@@ -19,6 +20,7 @@ class User(AbstractUser):
     phone = models.CharField(max_length=20, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
+    claims_version = models.PositiveIntegerField(default=0)  # Bumped to revoke JWT claims
     
     class Meta:
         db_table = 'users'
@@ -26,6 +28,14 @@ class User(AbstractUser):
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
+    
+    def refresh_from_db(self, using=None, fields=None):
+        # Users built from JWT claims are partially loaded; when one deferred
+        # field is read, fetch all of them in a single query
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
 
 
 # ======================
@@ -247,6 +257,43 @@ class Slide(models.Model):
         return f"{self.session} - Slide {self.slide_number}"
 
 
+class SlideTerm(models.Model):
+    """Inverted index of Slide.ai_definitions: normalized term -> slide"""
+    slide = models.ForeignKey(Slide, on_delete=models.CASCADE, related_name='terms')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='slide_terms')
+    term = models.CharField(max_length=255)
+    normalized_term = models.CharField(max_length=255)
+    definition = models.TextField(blank=True)
+    
+    class Meta:
+        db_table = 'slide_terms'
+        unique_together = ('slide', 'normalized_term')
+        indexes = [
+            models.Index(fields=['course', 'normalized_term']),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} ({self.slide})"
+
+
+class SlideQuestion(models.Model):
+    """Inverted index of Slide.ai_questions: normalized question -> slide"""
+    slide = models.ForeignKey(Slide, on_delete=models.CASCADE, related_name='questions')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='slide_questions')
+    question = models.TextField()
+    question_key = models.CharField(max_length=64)  # sha256 of the normalized question
+    
+    class Meta:
+        db_table = 'slide_questions'
+        unique_together = ('slide', 'question_key')
+        indexes = [
+            models.Index(fields=['course', 'question_key']),
+        ]
+    
+    def __str__(self):
+        return f"{self.question[:50]} ({self.slide})"
+
+
 class Note(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes',
                                limit_choices_to={'role': 'student'})
@@ -257,17 +304,55 @@ class Note(models.Model):
     content = models.TextField()  # Markdown-formatted
     tags = models.JSONField(default=list, blank=True)
     is_public = models.BooleanField(default=False)
+    version = models.IntegerField(default=0)  # Bumped on every content change (autosave)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'notes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', '-created_at']),
+            models.Index(fields=['is_public', '-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.title}"
 
 
+class NoteTag(models.Model):
+    """Normalized copy of Note.tags so tag filters can use an index"""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='tag_index')
+    tag = models.CharField(max_length=100)
+    
+    class Meta:
+        db_table = 'note_tags'
+        unique_together = ('note', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'note']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tag} ({self.note_id})"
+
+
+class NoteSearchTerm(models.Model):
+    """Full-text index of note title/content: one row per distinct word, weighted"""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.IntegerField(default=1)  # title hits count more than body hits
+    
+    class Meta:
+        db_table = 'note_search_terms'
+        unique_together = ('note', 'term')
+        indexes = [
+            models.Index(fields=['term', 'note']),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} ({self.note_id})"
+
+
 # ======================
 # Doubts & AI Responses
 # ======================
@@ -332,10 +417,14 @@ class Assignment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     max_score = models.FloatField(default=100.0)
     created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)  # When the late-status sweep ran
     
     class Meta:
         db_table = 'assignments'
         ordering = ['-due_date']
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+        ]
     
     def __str__(self):
         return f"{self.course.code} - {self.title}"
@@ -345,7 +434,6 @@ class Submission(models.Model):
     STATUS_CHOICES = [
         ('submitted', 'Submitted'),
         ('graded', 'Graded'),
-        ('late', 'Late Submission'),
     ]
     
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions',
@@ -354,6 +442,7 @@ class Submission(models.Model):
     content = models.TextField()
     file = models.FileField(upload_to='submissions/', null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='submitted')
+    is_late = models.BooleanField(default=False)  # Sent or changed after the due date; survives grading
     score = models.FloatField(null=True, blank=True)
     feedback = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
@@ -363,11 +452,67 @@ class Submission(models.Model):
         db_table = 'submissions'
         unique_together = ('student', 'assignment')
         ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['assignment', 'status']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.assignment.title}"
 
 
+class Fingerprint(models.Model):
+    """Winnowed k-gram hash of a Submission or CompilerSubmission, for similarity lookups"""
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='fingerprints')
+    compiler_submission = models.ForeignKey('CompilerSubmission', on_delete=models.CASCADE, null=True,
+                                            blank=True, related_name='fingerprints')
+    # Comparison scope: submissions compare within an assignment, code within a session
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='fingerprints')
+    session = models.ForeignKey(ClassSession, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='fingerprints')
+    hash = models.BigIntegerField()
+    
+    class Meta:
+        db_table = 'fingerprints'
+        indexes = [
+            models.Index(fields=['assignment', 'hash']),
+            models.Index(fields=['session', 'hash']),
+        ]
+    
+    def __str__(self):
+        return f"{self.hash} ({self.submission_id or self.compiler_submission_id})"
+
+
+class Upload(models.Model):
+    """Resumable chunked upload; completed files live in content-addressed storage"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)  # Client-declared, verified on completion
+    received_bytes = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='cas/', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'uploads'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.size})"
+
+
 # ======================
 # Analytics & Reports
 # ======================
@@ -390,23 +535,41 @@ class SessionReport(models.Model):
 
 
 class StudentPerformance(models.Model):
-    student = models.OneToOneField(User, on_delete=models.CASCADE, related_name='performance',
-                                  limit_choices_to={'role': 'student'})
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='performance',
+                               limit_choices_to={'role': 'student'})
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='performance')
     total_attendance_percentage = models.FloatField(default=0.0)
     average_assignment_score = models.FloatField(default=0.0)
     violation_count = models.IntegerField(default=0)
     total_focus_hours = models.FloatField(default=0.0)
+    missing_submissions = models.IntegerField(default=0)
+    at_risk_score = models.FloatField(default=0.0)  # 0 (on track) .. 1 (most at risk)
     last_updated = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'student_performance'
         unique_together = ('student', 'course')
+        indexes = [
+            models.Index(fields=['course', '-at_risk_score']),
+        ]
     
     def __str__(self):
         return f"Performance: {self.student.username} - {self.course.code}"
 
 
+class ExportWatermark(models.Model):
+    """Highest row id already written by incremental columnar exports, per dataset"""
+    dataset = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    exported_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'export_watermarks'
+    
+    def __str__(self):
+        return f"{self.dataset} @ {self.last_id}"
+
+
 # ======================
 # Compiler & Code Execution
 # ======================
@@ -0,0 +1,18 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class DownloadContentNegotiation(DefaultContentNegotiation):
+    """
+    For download actions: an Accept header none of the formats match (e.g.
+    application/json from an API client) gets the first format instead of
+    a 406. An explicit ?format= that is not offered is still refused.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            if format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE):
+                raise
+            return renderers[0], renderers[0].media_type
@@ -0,0 +1,169 @@
+import numpy as np
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Assignment, Attendance, ClassSession, Enrollment, StudentPerformance, Submission, Violation
+
+
+# Composite at-risk score: weighted sum of per-signal risks, each in 0..1
+WEIGHTS = {
+    'attendance': 0.35,
+    'scores': 0.30,
+    'missing': 0.20,
+    'violations': 0.15,
+}
+VIOLATION_Z_CAP = 3.0  # violation counts this many std devs above the course mean count as full risk
+UPDATE_FIELDS = [
+    'total_attendance_percentage', 'average_assignment_score', 'violation_count',
+    'total_focus_hours', 'missing_submissions', 'at_risk_score', 'last_updated',
+]
+
+
+def _keys(student_ids, course_ids):
+    return (np.asarray(student_ids, dtype=np.int64) << 32) | np.asarray(course_ids, dtype=np.int64)
+
+
+def _scatter(pair_keys, rows, n_values):
+    """
+    Place grouped rows (student_id, course_id, *values) onto the sorted pair
+    keys. Returns one float array per value; pairs without a row get 0.
+    """
+    out = [np.zeros(len(pair_keys)) for _ in range(n_values)]
+    if not rows:
+        return out
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+    keys = _keys(data[:, 0].astype(np.int64), data[:, 1].astype(np.int64))
+    pos = np.searchsorted(pair_keys, keys)
+    pos = np.minimum(pos, len(pair_keys) - 1)
+    hit = pair_keys[pos] == keys  # Ignore rows for students no longer enrolled
+    for i in range(n_values):
+        out[i][pos[hit]] = np.nan_to_num(data[hit, 2 + i])
+    return out
+
+
+def _per_course(course_ids, rows):
+    """Map grouped (course_id, value) rows onto the sorted course id array"""
+    out = np.zeros(len(course_ids))
+    for course_id, value in rows:
+        out[np.searchsorted(course_ids, course_id)] = value
+    return out
+
+
+def _group_mean(values, groups, n_groups, mask=None):
+    mask = np.ones(len(values), dtype=bool) if mask is None else mask
+    total = np.bincount(groups[mask], weights=values[mask], minlength=n_groups)
+    count = np.bincount(groups[mask], minlength=n_groups)
+    return np.divide(total, count, out=np.zeros(n_groups), where=count > 0), count
+
+
+def compute(courses, now=None):
+    """
+    Compute performance metrics for every active enrollment in `courses`.
+
+    Seven grouped queries fetch the raw aggregates; everything else (ratios,
+    imputation, per-course z-scores and the composite risk) is done on NumPy
+    arrays. Returns (student_ids, course_ids, metrics) with one array entry
+    per enrollment.
+    """
+    now = now or timezone.now()
+    course_ids = np.array(sorted(courses.values_list('id', flat=True)), dtype=np.int64)
+    ids = course_ids.tolist()
+
+    pairs = np.array(
+        Enrollment.objects.filter(course_id__in=ids, status='active')
+        .values_list('student_id', 'course_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    pair_keys = _keys(pairs[:, 0], pairs[:, 1])
+    order = np.argsort(pair_keys)
+    pairs, pair_keys = pairs[order], pair_keys[order]
+    if not len(pairs):
+        return pairs[:, 0], pairs[:, 1], {}
+    course_index = np.searchsorted(course_ids, pairs[:, 1])
+
+    att_sum, att_records, active_minutes = _scatter(pair_keys, list(
+        Attendance.objects.filter(session__course_id__in=ids)
+        .values('student_id', 'session__course_id')
+        .annotate(pct=Sum('attendance_percentage'), n=Count('id'), active=Sum('active_minutes'))
+        .values_list('student_id', 'session__course_id', 'pct', 'n', 'active')
+    ), 3)
+    graded_filter = Q(score__isnull=False, assignment__max_score__gt=0)
+    graded_sum, graded_count, submitted_due = _scatter(pair_keys, list(
+        Submission.objects.filter(assignment__course_id__in=ids)
+        .values('student_id', 'assignment__course_id')
+        .annotate(
+            pct=Sum(F('score') * 100.0 / F('assignment__max_score'), filter=graded_filter),
+            graded=Count('id', filter=graded_filter),
+            due=Count('id', filter=Q(assignment__due_date__lte=now)),
+        )
+        .values_list('student_id', 'assignment__course_id', 'pct', 'graded', 'due')
+    ), 3)
+    (violations,) = _scatter(pair_keys, list(
+        Violation.objects.filter(session__course_id__in=ids)
+        .values('student_id', 'session__course_id')
+        .annotate(n=Count('id'))
+        .values_list('student_id', 'session__course_id', 'n')
+    ), 1)
+    sessions_held = _per_course(course_ids, list(
+        ClassSession.objects.filter(course_id__in=ids, session_date__lte=now).exclude(status='cancelled')
+        .values('course_id').annotate(n=Count('id')).values_list('course_id', 'n')
+    ))[course_index]
+    assignments_due = _per_course(course_ids, list(
+        Assignment.objects.filter(course_id__in=ids, due_date__lte=now).exclude(status='draft')
+        .values('course_id').annotate(n=Count('id')).values_list('course_id', 'n')
+    ))[course_index]
+
+    # Students without a record for a held session were absent (0%)
+    sessions = np.maximum(sessions_held, att_records)
+    attendance = np.divide(att_sum, sessions, out=np.zeros(len(pairs)), where=sessions > 0)
+    graded = graded_count > 0
+    scores = np.divide(graded_sum, graded_count, out=np.zeros(len(pairs)), where=graded)
+    missing = np.maximum(assignments_due - submitted_due, 0)
+
+    n_courses = len(course_ids)
+    attendance_risk = np.where(sessions > 0, 1 - attendance / 100, 0.0)
+    # Ungraded students take their course's average score risk rather than 0 or 1
+    course_score, course_graded = _group_mean(scores, course_index, n_courses, mask=graded)
+    imputed = np.where(course_graded > 0, 1 - course_score / 100, 0.0)[course_index]
+    score_risk = np.where(graded, 1 - scores / 100, imputed)
+    missing_risk = np.divide(missing, assignments_due, out=np.zeros(len(pairs)), where=assignments_due > 0)
+    mean_v, _ = _group_mean(violations, course_index, n_courses)
+    mean_sq, _ = _group_mean(violations ** 2, course_index, n_courses)
+    std_v = np.sqrt(np.maximum(mean_sq - mean_v ** 2, 0))[course_index]
+    z = np.divide(violations - mean_v[course_index], std_v, out=np.zeros(len(pairs)), where=std_v > 0)
+    violation_risk = np.clip(z, 0, VIOLATION_Z_CAP) / VIOLATION_Z_CAP
+
+    at_risk = (
+        WEIGHTS['attendance'] * np.clip(attendance_risk, 0, 1)
+        + WEIGHTS['scores'] * np.clip(score_risk, 0, 1)
+        + WEIGHTS['missing'] * missing_risk
+        + WEIGHTS['violations'] * violation_risk
+    )
+    return pairs[:, 0], pairs[:, 1], {
+        'total_attendance_percentage': np.round(np.clip(attendance, 0, 100), 2),
+        'average_assignment_score': np.round(scores, 2),
+        'violation_count': violations.astype(np.int64),
+        'total_focus_hours': np.round(active_minutes / 60, 2),
+        'missing_submissions': missing.astype(np.int64),
+        'at_risk_score': np.round(at_risk, 4),
+    }
+
+
+def recompute(courses, batch_size=1000):
+    """Recompute and upsert StudentPerformance rows for every active enrollment in `courses`"""
+    student_ids, course_ids, metrics = compute(courses)
+    if not len(student_ids):
+        return 0
+    columns = {name: values.tolist() for name, values in metrics.items()}
+    rows = [
+        StudentPerformance(
+            student_id=student_id, course_id=course_id,
+            **{name: values[i] for name, values in columns.items()},
+        )
+        for i, (student_id, course_id) in enumerate(zip(student_ids.tolist(), course_ids.tolist()))
+    ]
+    StudentPerformance.objects.bulk_create(
+        rows, batch_size=batch_size, update_conflicts=True,
+        unique_fields=['student', 'course'], update_fields=UPDATE_FIELDS,
+    )
+    return len(rows)
@@ -1,6 +1,11 @@
 from rest_framework import permissions
 
 
+def _teaches(user, course_id):
+    course = get_reference('course', course_id)
+    return course is not None and course.faculty_id == user.pk
+
+
 class IsSuperAdmin(permissions.BasePermission):
     """
     Allows access only to super admin users (role='admin').
@@ -29,8 +34,8 @@ class IsCollegeAdmin(permissions.BasePermission):
         if request.user.role == 'admin':
             # Check if managing own college
             return (
-                (hasattr(obj, 'college') and obj.college == request.user.college) or
-                (hasattr(obj, 'admin') and obj.admin == request.user)
+                (hasattr(obj, 'college_id') and obj.college_id == request.user.college_id) or
+                (hasattr(obj, 'admin_id') and obj.admin_id == request.user.pk)
             )
         return False
 
@@ -116,7 +121,7 @@ class CanManageEnrollment(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Admin of the college can manage
         if request.user.role == 'admin':
-            return obj.course.program.college == request.user.college
+            return course_college_id(obj.course_id) == request.user.college_id
         
         # Student can view/modify own enrollment
         if request.user.role == 'student':
@@ -124,7 +129,7 @@ class CanManageEnrollment(permissions.BasePermission):
         
         # Faculty can view enrollments in their course
         if request.user.role == 'faculty':
-            return obj.course.faculty == request.user
+            return _teaches(request.user, obj.course_id)
         
         return False
 
@@ -147,7 +152,7 @@ class CanMarkAttendance(permissions.BasePermission):
         
         # Faculty can mark attendance for their sessions
         if request.user.role == 'faculty':
-            return obj.session.course.faculty == request.user
+            return _teaches(request.user, obj.session.course_id)
         
         return False
 
@@ -163,15 +168,11 @@ class CanViewSession(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Faculty can view their sessions
         if request.user.role == 'faculty':
-            return obj.course.faculty == request.user
+            return _teaches(request.user, obj.course_id)
         
         # Student can view sessions for their enrolled courses
         if request.user.role == 'student':
-            return Enrollment.objects.filter(
-                student=request.user,
-                course=obj.course,
-                status='active'
-            ).exists()
+            return obj.course_id in request_course_ids(request)
         
         # Admin can view all
         if request.user.role == 'admin':
@@ -181,4 +182,5 @@ class CanViewSession(permissions.BasePermission):
 
 
 # Import here to avoid circular imports
-from core.models import Enrollment
+from core.authentication import request_course_ids
+from core.reference import course_college_id, get as get_reference
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+
+from . import versions
+from .models import College, Course, Program, User
+
+
+ENTRY_KEY = 'reference:{}:{}:{}'
+CACHE_TIMEOUT = 60 * 60 * 24  # Safety net; writes invalidate through the stamp
+MODELS = {'college': College, 'program': Program, 'course': Course}
+
+
+def scope(name):
+    """Version scope of a reference model, also used in ETags"""
+    return f'reference:{name}'
+
+
+def bump(name):
+    """Invalidate every cached row of one reference model"""
+    versions.bump(scope(name))
+
+
+def current_stamp(name):
+    return versions.current([scope(name)])[0]
+
+
+def _load(name, ids):
+    rows = MODELS[name].objects.in_bulk(ids)
+    if name == 'course':
+        # Serializers show the teacher's name; keep it with the row
+        names = {
+            pk: f'{first} {last}'.strip() for pk, first, last in
+            User.objects.filter(pk__in={c.faculty_id for c in rows.values()})
+            .values_list('pk', 'first_name', 'last_name')
+        }
+        for course in rows.values():
+            course.faculty_name = names.get(course.faculty_id, '')
+    return rows
+
+
+def get_many(name, ids):
+    """
+    {pk: instance} for the College, Program or Course rows with these ids,
+    read through the cache. Missing rows are loaded with one query and
+    cached until the next write to that model bumps its stamp.
+    """
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return {}
+    stamp = current_stamp(name)
+    keys = {ENTRY_KEY.format(name, stamp, pk): pk for pk in ids}
+    found = {keys[key]: obj for key, obj in cache.get_many(list(keys)).items()}
+    missing = ids - found.keys()
+    if missing:
+        loaded = _load(name, missing)
+        cache.set_many({ENTRY_KEY.format(name, stamp, pk): obj for pk, obj in loaded.items()}, CACHE_TIMEOUT)
+        found.update(loaded)
+    return found
+
+
+def get(name, pk, memo=None):
+    """
+    One cached row, or None. `memo` (any dict, e.g. the serializer context)
+    saves repeat lookups of the same row within a request.
+    """
+    if pk is None:
+        return None
+    if memo is not None and (name, pk) in memo:
+        return memo[(name, pk)]
+    obj = get_many(name, [pk]).get(pk)
+    if memo is not None:
+        memo[(name, pk)] = obj
+    return obj
+
+
+def course_college_id(course_id):
+    course = get('course', course_id)
+    program = get('program', course.program_id) if course else None
+    return program.college_id if program else None
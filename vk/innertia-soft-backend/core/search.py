@@ -0,0 +1,80 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import NoteTag, NoteSearchTerm
+
+
+TITLE_WEIGHT = 5
+MAX_TERM_LENGTH = 64
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i if in into is it its
+    me my no not of on or our she so that the their them then there these they this
+    to was we were what when which who will with you your
+""".split())
+
+_word = re.compile(r"[^\W_]+(?:['’][^\W_]+)*")
+
+
+def tokenize(text):
+    """Split markdown/plain text into lowercase index terms"""
+    for word in _word.findall(str(text or '').lower()):
+        word = word.replace('’', "'")
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        # Light plural folding so "trees" matches "tree"; applied to queries too
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        yield word[:MAX_TERM_LENGTH]
+
+
+def normalize_tag(tag):
+    return ' '.join(str(tag).split()).lower().lstrip('#')[:100]
+
+
+def index_note(note):
+    """Rebuild the tag and search-term rows for a single note"""
+    weights = Counter(tokenize(note.content))
+    for term in tokenize(note.title):
+        weights[term] += TITLE_WEIGHT
+    tags = {normalize_tag(tag) for tag in (note.tags or []) if normalize_tag(tag)}
+
+    with transaction.atomic():
+        NoteSearchTerm.objects.filter(note=note).delete()
+        NoteTag.objects.filter(note=note).delete()
+        NoteSearchTerm.objects.bulk_create([
+            NoteSearchTerm(note=note, term=term, weight=weight)
+            for term, weight in weights.items()
+        ])
+        NoteTag.objects.bulk_create([NoteTag(note=note, tag=tag) for tag in tags])
+
+
+def rebuild_index(notes):
+    count = 0
+    for note in notes.iterator():
+        index_note(note)
+        count += 1
+    return count
+
+
+def search_notes(queryset, query):
+    """
+    Restrict a Note queryset to notes containing every word of the query,
+    ranked by summed term weight (title matches first).
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset
+    return queryset.filter(search_terms__term__in=terms).annotate(
+        search_rank=Sum('search_terms__weight'),
+        matched_terms=Count('search_terms__term', distinct=True),
+    ).filter(matched_terms=len(terms)).order_by('-search_rank', '-updated_at')
+
+
+def filter_by_tags(queryset, tags):
+    """Restrict a Note queryset to notes carrying all of the given tags"""
+    for tag in {normalize_tag(tag) for tag in tags if normalize_tag(tag)}:
+        queryset = queryset.filter(pk__in=NoteTag.objects.filter(tag=tag).values('note_id'))
+    return queryset
@@ -1,20 +1,107 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import (
     College, Program, Course, Enrollment, ClassSession, Attendance,
     FocusLog, Violation, Slide, Note, Doubt, DoubtResponse, Assignment,
-    Submission, SessionReport, StudentPerformance, CompilerSubmission, ScreenLock
+    Submission, SessionReport, StudentPerformance, CompilerSubmission, ScreenLock, Upload
 )
+from .authentication import ClaimsRefreshToken
+from .images import source_version
+from . import reference, sparse
 
 User = get_user_model()
 
 
+class ReferenceField(serializers.ReadOnlyField):
+    """
+    An attribute of a College/Program/Course read from the reference cache
+    instead of following the foreign key. `source` must give the row's id.
+    """
+
+    def __init__(self, model, attr, **kwargs):
+        self.model, self.attr = model, attr
+        super().__init__(**kwargs)
+
+    def to_representation(self, pk):
+        obj = reference.get(self.model, pk, self.context.setdefault('reference_memo', {}))
+        return getattr(obj, self.attr, None)
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=id,title,session_info.topic` returns only the named fields.
+    Meta.expandable_fields (heavy nested objects and text) are dropped when
+    `?expand=` is given without naming them. Applies to GET requests; the
+    top-level serializer passes the relevant part on to nested ones.
+    """
+
+    def _sparse_spec(self):
+        if hasattr(self, '_sparse'):
+            return self._sparse
+        root = self.root
+        if root is not self and getattr(root, 'child', None) is not self:
+            return None, None
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None, None
+        return sparse.parse(request.query_params.get('fields')), sparse.parse(request.query_params.get('expand'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._sparse_spec()
+        if only is None and expand is None:
+            return fields
+        kept = sparse.select(fields, getattr(self.Meta, 'expandable_fields', ()), only, expand)
+        for name, spec in kept.items():
+            nested = getattr(fields[name], 'child', fields[name])
+            if isinstance(nested, SparseFieldsMixin):
+                nested._sparse = spec
+        return {name: fields[name] for name in kept}
+
+
+def derivative_url(serializer, url_name, pk, field_file, width=320):
+    """Build a resized-image URL whose `v` changes whenever the stored file does"""
+    if not field_file:
+        return None
+    version = source_version(field_file)
+    url = reverse(url_name, args=[pk], request=serializer.context.get('request'))
+    return f'{url}?w={width}&v={version}'
+
+
+class UploadedFileMixin(serializers.Serializer):
+    """Lets a serializer take `upload` (a completed /uploads/ id) in place of a multipart file"""
+    upload = serializers.PrimaryKeyRelatedField(
+        queryset=Upload.objects.filter(status='complete'), write_only=True, required=False
+    )
+    
+    def validate_upload(self, value):
+        request = self.context.get('request')
+        if request is None or value.user_id != request.user.id:
+            raise serializers.ValidationError("Upload not found")
+        return value
+    
+    def _attach_upload(self, validated_data):
+        upload = validated_data.pop('upload', None)
+        if upload is not None:
+            validated_data['file'] = upload.file.name
+        return validated_data
+    
+    def create(self, validated_data):
+        return super().create(self._attach_upload(validated_data))
+    
+    def update(self, instance, validated_data):
+        return super().update(instance, self._attach_upload(validated_data))
+
+
 # ======================
 # Auth Serializers
 # ======================
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
     
@@ -38,11 +125,23 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
-class UserSerializer(serializers.ModelSerializer):
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Reissues role/college/course claims when they are out of date"""
+    token_class = ClaimsRefreshToken
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    avatar_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'college', 'phone', 'date_joined']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'college', 'phone',
+                 'avatar_url', 'date_joined']
         read_only_fields = ['id', 'date_joined']
+        field_requires = {'avatar_url': ['profile_picture']}
+    
+    def get_avatar_url(self, obj):
+        return derivative_url(self, 'user-avatar', obj.pk, obj.profile_picture, width=160)
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -84,15 +183,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 # Institution Serializers
 # ======================
 
-class CollegeSerializer(serializers.ModelSerializer):
+class CollegeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = College
         fields = ['id', 'name', 'code', 'address', 'city', 'country', 'admin', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class ProgramSerializer(serializers.ModelSerializer):
-    college_name = serializers.CharField(source='college.name', read_only=True)
+class ProgramSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    college_name = ReferenceField('college', 'name', source='college_id')
     
     class Meta:
         model = Program
@@ -100,9 +199,9 @@ class ProgramSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class CourseSerializer(serializers.ModelSerializer):
-    faculty_name = serializers.CharField(source='faculty.get_full_name', read_only=True)
-    program_name = serializers.CharField(source='program.name', read_only=True)
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    faculty_name = ReferenceField('course', 'faculty_name', source='pk')
+    program_name = ReferenceField('program', 'name', source='program_id')
     
     class Meta:
         model = Course
@@ -121,9 +220,9 @@ class CourseSerializer(serializers.ModelSerializer):
         return value
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
-    course_code = serializers.CharField(source='course.code', read_only=True)
+    course_code = ReferenceField('course', 'code', source='course_id')
     
     class Meta:
         model = Enrollment
@@ -135,9 +234,9 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 # Session & Attendance Serializers
 # ======================
 
-class ClassSessionSerializer(serializers.ModelSerializer):
+class ClassSessionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     faculty_name = serializers.CharField(source='faculty.get_full_name', read_only=True)
-    course_code = serializers.CharField(source='course.code', read_only=True)
+    course_code = ReferenceField('course', 'code', source='course_id')
     
     class Meta:
         model = ClassSession
@@ -146,7 +245,7 @@ class ClassSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     session_topic = serializers.CharField(source='session.topic', read_only=True)
     
@@ -162,14 +261,14 @@ class AttendanceSerializer(serializers.ModelSerializer):
 # Focus & Violation Serializers
 # ======================
 
-class FocusLogSerializer(serializers.ModelSerializer):
+class FocusLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = FocusLog
         fields = ['id', 'student', 'session', 'event_type', 'timestamp', 'metadata']
         read_only_fields = ['id', 'timestamp']
 
 
-class ViolationSerializer(serializers.ModelSerializer):
+class ViolationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     
     class Meta:
@@ -183,29 +282,43 @@ class ViolationSerializer(serializers.ModelSerializer):
 # Content & Material Serializers
 # ======================
 
-class SlideSerializer(serializers.ModelSerializer):
+class SlideSerializer(SparseFieldsMixin, UploadedFileMixin, serializers.ModelSerializer):
+    thumbnail_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = Slide
-        fields = ['id', 'session', 'slide_number', 'title', 'content', 'image_url',
-                 'ai_summary', 'ai_definitions', 'ai_questions', 'created_at']
+        fields = ['id', 'session', 'slide_number', 'title', 'content', 'image_url', 'thumbnail_url',
+                 'upload', 'ai_summary', 'ai_definitions', 'ai_questions', 'created_at']
         read_only_fields = ['id', 'created_at']
+        expandable_fields = ['content', 'ai_summary', 'ai_definitions', 'ai_questions']
+        field_requires = {'thumbnail_url': ['file']}
+    
+    def get_thumbnail_url(self, obj):
+        return derivative_url(self, 'slide-image', obj.pk, obj.file)
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     
     class Meta:
         model = Note
         fields = ['id', 'student', 'student_name', 'session', 'slide', 'title',
-                 'content', 'tags', 'is_public', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                 'content', 'tags', 'is_public', 'version', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
+        expandable_fields = ['content']
+
+
+class NoteAutosaveSerializer(serializers.Serializer):
+    base_version = serializers.IntegerField(min_value=0)
+    deltas = serializers.ListField(child=serializers.DictField(), allow_empty=True)
+    flush = serializers.BooleanField(default=False)
 
 
 # ======================
 # Doubt & AI Serializers
 # ======================
 
-class DoubtResponseSerializer(serializers.ModelSerializer):
+class DoubtResponseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     slide_title = serializers.CharField(source='source_slide.title', read_only=True)
     
     class Meta:
@@ -216,7 +329,7 @@ class DoubtResponseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'responded_at']
 
 
-class DoubtSerializer(serializers.ModelSerializer):
+class DoubtSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     response = DoubtResponseSerializer(read_only=True)
     
@@ -225,14 +338,15 @@ class DoubtSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_name', 'session', 'question', 'status',
                  'asked_at', 'resolved_at', 'response']
         read_only_fields = ['id', 'asked_at']
+        expandable_fields = ['response']
 
 
 # ======================
 # Assessment Serializers
 # ======================
 
-class AssignmentSerializer(serializers.ModelSerializer):
-    course_code = serializers.CharField(source='course.code', read_only=True)
+class AssignmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    course_code = ReferenceField('course', 'code', source='course_id')
     
     class Meta:
         model = Assignment
@@ -252,23 +366,58 @@ class AssignmentSerializer(serializers.ModelSerializer):
         return value
 
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(SparseFieldsMixin, UploadedFileMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     assignment_title = serializers.CharField(source='assignment.title', read_only=True)
     
     class Meta:
         model = Submission
         fields = ['id', 'student', 'student_name', 'assignment', 'assignment_title',
-                 'content', 'file', 'status', 'score', 'feedback',
+                 'content', 'file', 'upload', 'status', 'is_late', 'score', 'feedback',
                  'submitted_at', 'graded_at']
-        read_only_fields = ['id', 'submitted_at']
+        read_only_fields = ['id', 'is_late', 'submitted_at']
+        expandable_fields = ['content', 'feedback']
+    
+    def validate(self, attrs):
+        assignment = attrs.get('assignment') or getattr(self.instance, 'assignment', None)
+        if assignment is not None and assignment.status == 'closed':
+            raise serializers.ValidationError({'assignment': 'This assignment is closed'})
+        return attrs
+    
+    def _flag_late(self, validated_data, instance=None):
+        assignment = validated_data.get('assignment') or instance.assignment
+        validated_data['is_late'] = (instance is not None and instance.is_late) or \
+            timezone.now() > assignment.due_date
+        return validated_data
+    
+    def create(self, validated_data):
+        return super().create(self._flag_late(validated_data))
+    
+    def update(self, instance, validated_data):
+        return super().update(instance, self._flag_late(validated_data, instance))
+
+
+class UploadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+    
+    class Meta:
+        model = Upload
+        fields = ['id', 'filename', 'size', 'sha256', 'offset', 'status', 'file',
+                 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'file', 'created_at', 'updated_at']
+    
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError("sha256 must be 64 hex characters")
+        return value
 
 
 # ======================
 # Analytics Serializers
 # ======================
 
-class SessionReportSerializer(serializers.ModelSerializer):
+class SessionReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     session_info = ClassSessionSerializer(source='session', read_only=True)
     
     class Meta:
@@ -277,17 +426,19 @@ class SessionReportSerializer(serializers.ModelSerializer):
                  'absent_count', 'average_attendance_percentage', 'violation_count',
                  'focus_duration_minutes', 'generated_at']
         read_only_fields = ['id', 'generated_at']
+        expandable_fields = ['session_info']
 
 
-class StudentPerformanceSerializer(serializers.ModelSerializer):
+class StudentPerformanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
-    course_code = serializers.CharField(source='course.code', read_only=True)
+    course_code = ReferenceField('course', 'code', source='course_id')
     
     class Meta:
         model = StudentPerformance
         fields = ['id', 'student', 'student_name', 'course', 'course_code',
                  'total_attendance_percentage', 'average_assignment_score',
-                 'violation_count', 'total_focus_hours', 'last_updated']
+                 'violation_count', 'total_focus_hours', 'missing_submissions',
+                 'at_risk_score', 'last_updated']
         read_only_fields = ['id', 'last_updated']
 
 
@@ -295,7 +446,7 @@ class StudentPerformanceSerializer(serializers.ModelSerializer):
 # Compiler & Code Execution Serializers
 # ======================
 
-class CompilerSubmissionSerializer(serializers.ModelSerializer):
+class CompilerSubmissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     session_info = serializers.SerializerMethodField()
     
@@ -306,6 +457,8 @@ class CompilerSubmissionSerializer(serializers.ModelSerializer):
                  'status', 'created_at', 'executed_at']
         read_only_fields = ['id', 'stdout', 'stderr', 'execution_time', 
                            'status', 'created_at', 'executed_at']
+        expandable_fields = ['code', 'stdout', 'stderr']
+        field_requires = {'session_info': ['session__course']}
     
     def get_session_info(self, obj):
         return {
@@ -315,7 +468,7 @@ class CompilerSubmissionSerializer(serializers.ModelSerializer):
         }
 
 
-class ScreenLockSerializer(serializers.ModelSerializer):
+class ScreenLockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     locked_by_name = serializers.CharField(source='locked_by.get_full_name', read_only=True)
     
@@ -0,0 +1,273 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    ClassSession, Slide, SlideTerm, SlideQuestion, Note, Doubt, Submission, CompilerSubmission,
+    Enrollment, Attendance, Assignment, FocusLog, ScreenLock, Violation, User, College, Program, Course
+)
+from .authentication import forget_enrollments, revoke_claims
+from .glossary import index_slide
+from .search import index_note
+from . import anomaly, distributions, doubt_queue, live_state, reference, versions
+from .similarity import index_submission, index_compiler_submission
+
+
+logger = logging.getLogger(__name__)
+
+
+def _update_live_state(func, *args):
+    """
+    Runs after commit, inline in autocommit mode: a busy dashboard lock is
+    logged, not raised, so it cannot turn a saved event into a 500
+    """
+    try:
+        func(*args)
+    except TimeoutError:
+        logger.warning('Live dashboard update %s%r skipped: lock busy', func.__name__, args)
+
+
+@receiver(post_save, sender=Slide)
+def reindex_slide(sender, instance, raw=False, **kwargs):
+    """Keep the glossary / question-bank index in step with the slide JSON"""
+    if raw:
+        return
+    index_slide(instance)
+
+
+@receiver(post_save, sender=ClassSession)
+def move_slide_index(sender, instance, created=False, raw=False, **kwargs):
+    """Re-point index rows if a session is moved to another course"""
+    if raw or created:
+        return
+    SlideTerm.objects.filter(slide__session=instance).exclude(course_id=instance.course_id) \
+        .update(course_id=instance.course_id)
+    SlideQuestion.objects.filter(slide__session=instance).exclude(course_id=instance.course_id) \
+        .update(course_id=instance.course_id)
+
+
+@receiver(post_save, sender=Note)
+def reindex_note(sender, instance, raw=False, **kwargs):
+    """Keep the note tag and full-text index current"""
+    if raw:
+        return
+    index_note(instance)
+
+
+@receiver(post_save, sender=Doubt)
+@receiver(post_delete, sender=Doubt)
+def refresh_doubt_queue(sender, instance, raw=False, **kwargs):
+    """Invalidate the ranked doubt queue of the session once the write commits"""
+    if raw:
+        return
+    session_id = instance.session_id
+    transaction.on_commit(lambda: doubt_queue.bump(session_id))
+
+
+@receiver(post_save, sender=Submission)
+def fingerprint_submission(sender, instance, raw=False, **kwargs):
+    """Refresh plagiarism fingerprints (a no-op write when content is unchanged)"""
+    if raw:
+        return
+    index_submission(instance)
+
+
+@receiver(post_save, sender=CompilerSubmission)
+def fingerprint_compiler_submission(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_compiler_submission(instance)
+
+
+def _bump_course_stats(course_id):
+    if course_id is not None:
+        transaction.on_commit(lambda: distributions.bump(course_id))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=ClassSession)
+@receiver(post_delete, sender=ClassSession)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def refresh_course_stats(sender, instance, raw=False, **kwargs):
+    """Invalidate cached course distributions"""
+    if raw:
+        return
+    _bump_course_stats(instance.course_id)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_course_stats_for_attendance(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _bump_course_stats(
+        ClassSession.objects.filter(pk=instance.session_id).values_list('course_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def refresh_course_stats_for_submission(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _bump_course_stats(
+        Assignment.objects.filter(pk=instance.assignment_id).values_list('course_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=FocusLog)
+def update_live_focus(sender, instance, created=False, raw=False, **kwargs):
+    """Feed the live session dashboard"""
+    if raw or not created:
+        return
+    args = (instance.session_id, instance.student_id, instance.event_type, instance.timestamp)
+    transaction.on_commit(lambda: _update_live_state(live_state.record_focus, *args))
+
+
+@receiver(post_save, sender=FocusLog)
+def detect_focus_anomaly(sender, instance, created=False, raw=False, **kwargs):
+    """Run the streaming burst detector; may create or extend a Violation"""
+    if raw or not created:
+        return
+    args = (instance.session_id, instance.student_id, instance.event_type, instance.timestamp)
+    transaction.on_commit(lambda: anomaly.observe(*args))
+
+
+@receiver(post_save, sender=ScreenLock)
+def update_live_lock(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    args = (instance.session_id, instance.student_id, instance.is_locked)
+    transaction.on_commit(lambda: _update_live_state(live_state.record_lock, *args))
+
+
+@receiver(post_save, sender=Violation)
+@receiver(post_delete, sender=Violation)
+def update_live_violations(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    is_open = not instance.is_resolved and kwargs.get('signal') is post_save
+    args = (instance.session_id, instance.student_id, instance.id, is_open)
+    transaction.on_commit(lambda: _update_live_state(live_state.record_violation, *args))
+
+
+@receiver(pre_save, sender=User)
+def detect_claims_change(sender, instance, raw=False, **kwargs):
+    """Flag users whose role, college or active state is about to change"""
+    update_fields = kwargs.get('update_fields')
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'role', 'college', 'college_id', 'is_active'} & update_fields:
+        return
+    fields = ['role', 'college_id', 'is_active']
+    loaded = [f for f in fields if f not in instance.get_deferred_fields()]
+    current = User.objects.filter(pk=instance.pk).values(*loaded).first()
+    instance._claims_changed = current is not None and any(
+        current[f] != getattr(instance, f) for f in loaded
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_claims(sender, instance, raw=False, **kwargs):
+    """Tokens carrying the old role/college stop working once the change commits"""
+    if raw or not getattr(instance, '_claims_changed', False):
+        return
+    instance._claims_changed = False
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_claims([user_id]))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def revoke_enrollment_claims(sender, instance, raw=False, **kwargs):
+    """A student's cached course ids and course claim list are stale after any enrollment change"""
+    if raw:
+        return
+    student_id = instance.student_id
+
+    def revoke():
+        forget_enrollments([student_id])
+        revoke_claims([student_id])
+    transaction.on_commit(revoke)
+
+
+@receiver(post_save, sender=College)
+@receiver(post_delete, sender=College)
+@receiver(post_save, sender=Program)
+@receiver(post_delete, sender=Program)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def refresh_reference_cache(sender, instance, raw=False, **kwargs):
+    """Invalidate the cached rows of the model that changed"""
+    if raw:
+        return
+    name = sender._meta.model_name
+    transaction.on_commit(lambda: reference.bump(name))
+
+
+@receiver(post_save, sender=User)
+def refresh_course_faculty_names(sender, instance, raw=False, created=False, **kwargs):
+    """Cached courses and session listings carry their teacher's name"""
+    if raw or created or instance.role != 'faculty':
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'first_name', 'last_name'} & update_fields:
+        return
+
+    def bump():
+        reference.bump('course')
+        versions.bump('sessions')
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=ClassSession)
+@receiver(post_delete, sender=ClassSession)
+def refresh_session_versions(sender, instance, raw=False, **kwargs):
+    """New ETags for session listings"""
+    if raw:
+        return
+    transaction.on_commit(lambda: versions.bump('sessions'))
+
+
+# Models whose views use ConditionalGetMixin's default etag_scopes. None do
+# yet: the course, session and slide views name their own scopes, and
+# bumping on every write of a busy model costs a cache write for nothing.
+VERSIONED_MODELS = ()
+
+
+def refresh_model_version(sender, instance, raw=False, **kwargs):
+    """New ETags for views that key on the model alone (the default etag_scopes)"""
+    if raw:
+        return
+    scope = versions.model_scope(sender)
+    transaction.on_commit(lambda: versions.bump(scope))
+
+
+for _model in VERSIONED_MODELS:
+    post_save.connect(refresh_model_version, sender=_model)
+    post_delete.connect(refresh_model_version, sender=_model)
+
+
+@receiver(pre_save, sender=Slide)
+def remember_slide_session(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_session_id = Slide.objects.filter(pk=instance.pk) \
+        .values_list('session_id', flat=True).first()
+
+
+@receiver(post_save, sender=Slide)
+@receiver(post_delete, sender=Slide)
+def refresh_slide_versions(sender, instance, raw=False, **kwargs):
+    """New ETags for the slide listing of the session (and the one it left)"""
+    if raw:
+        return
+    scopes = {'slides', f'slides:{instance.session_id}'}
+    previous = getattr(instance, '_previous_session_id', None)
+    if previous is not None:
+        scopes.add(f'slides:{previous}')
+    transaction.on_commit(lambda: versions.bump(*scopes))
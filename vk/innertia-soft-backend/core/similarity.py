@@ -0,0 +1,170 @@
+import hashlib
+import re
+from collections import Counter
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Fingerprint
+
+
+K = 24        # characters per k-gram (after normalization)
+WINDOW = 8    # winnowing window; any shared run of K + WINDOW - 1 chars is detected
+# Hashes shared by more than this fraction of a class are boilerplate (templates, imports)
+COMMON_HASH_FRACTION = 0.2
+
+_comment = re.compile(r'#[^\n]*|//[^\n]*|/\*.*?\*/', re.S)
+_space = re.compile(r'\s+')
+
+
+def normalize(text, code=False):
+    if code:
+        text = _comment.sub('', text)
+    return _space.sub('', text.lower())
+
+
+def _hash(gram):
+    # Signed 64-bit so it fits a BigIntegerField on every backend
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def winnow(text, code=False):
+    """Return the set of winnowed k-gram fingerprints of a document"""
+    text = normalize(text or '', code=code)
+    if len(text) < K:
+        return {_hash(text)} if text else set()
+    hashes = [_hash(text[i:i + K]) for i in range(len(text) - K + 1)]
+    if len(hashes) <= WINDOW:
+        return {min(hashes)}
+
+    # Keep the minimum hash of every window of WINDOW consecutive k-grams
+    return {min(hashes[start:start + WINDOW]) for start in range(len(hashes) - WINDOW + 1)}
+
+
+def _store(filter_kwargs, scope_kwargs, hashes):
+    existing = set(Fingerprint.objects.filter(**filter_kwargs).values_list('hash', flat=True))
+    if existing == hashes:
+        return
+    with transaction.atomic():
+        Fingerprint.objects.filter(**filter_kwargs).delete()
+        Fingerprint.objects.bulk_create(
+            [Fingerprint(hash=h, **filter_kwargs, **scope_kwargs) for h in hashes],
+            batch_size=1000,
+        )
+
+
+def index_submission(submission):
+    _store({'submission': submission}, {'assignment_id': submission.assignment_id},
+           winnow(submission.content))
+
+
+def index_compiler_submission(submission):
+    _store({'compiler_submission': submission}, {'session_id': submission.session_id},
+           winnow(submission.code, code=True))
+
+
+def _score(shared, size_a, size_b):
+    smaller = min(size_a, size_b)
+    return round(shared / smaller, 4) if smaller else 0.0
+
+
+def _common_hashes(field, scope):
+    """
+    (document count, hashes in more than COMMON_HASH_FRACTION of the scope's
+    documents). Those mark shared templates and imports, not copying, so
+    neither top_similar nor similarity_report counts them as shared.
+    """
+    in_scope = Fingerprint.objects.filter(**scope)
+    doc_count = in_scope.values(f'{field}_id').distinct().count()
+    max_shared = max(5, int(doc_count * COMMON_HASH_FRACTION))
+    common = in_scope.values('hash').annotate(docs=Count('id')).filter(docs__gt=max_shared).values('hash')
+    return doc_count, common
+
+
+def _sizes(filters, field):
+    """{document id: fingerprint count}, boilerplate included"""
+    return dict(Fingerprint.objects.filter(**filters).values_list(f'{field}_id').annotate(n=Count('id')))
+
+
+def top_similar(field, obj, scope_field, k=5):
+    """
+    Most similar documents to `obj` within its scope, using the hash index.
+    field is 'submission' or 'compiler_submission'; scope_field 'assignment' or 'session'.
+    """
+    scope = {f'{scope_field}_id': getattr(obj, f'{scope_field}_id')}
+    own = Fingerprint.objects.filter(**{field: obj})
+    own_count = own.count()
+    if not own_count:
+        return []
+
+    _, common = _common_hashes(field, scope)
+    matches = list(
+        Fingerprint.objects.filter(**scope, hash__in=own.values('hash'))
+        .exclude(hash__in=common)
+        .exclude(**{field: obj})
+        .values(f'{field}_id')
+        .annotate(shared=Count('id'))
+        .order_by('-shared')[:k * 3]
+    )
+    sizes = _sizes({f'{field}_id__in': [m[f'{field}_id'] for m in matches]}, field)
+    results = [
+        {'id': m[f'{field}_id'], 'shared': m['shared'],
+         'score': _score(m['shared'], own_count, sizes.get(m[f'{field}_id'], 0))}
+        for m in matches
+    ]
+    results.sort(key=lambda r: r['score'], reverse=True)
+    return results[:k]
+
+
+def similarity_report(field, scope_field, scope_id, min_score=0.3):
+    """
+    All document pairs in a scope whose overlap is at least min_score.
+    Streams (hash, doc) rows ordered by hash, boilerplate hashes left out,
+    and counts co-occurring pairs.
+    """
+    scope = {f'{scope_field}_id': scope_id}
+    doc_count, common = _common_hashes(field, scope)
+    sizes = _sizes(scope, field)
+    rows = (
+        Fingerprint.objects.filter(**scope)
+        .exclude(hash__in=common)
+        .order_by('hash')
+        .values_list('hash', f'{field}_id')
+    )
+    pairs = Counter()
+    docs_for_hash = []
+    current = None
+
+    def flush(docs):
+        for pair in combinations(sorted(docs), 2):
+            pairs[pair] += 1
+
+    for h, doc in rows.iterator(chunk_size=5000):
+        if h != current:
+            flush(docs_for_hash)
+            docs_for_hash = []
+            current = h
+        docs_for_hash.append(doc)
+    flush(docs_for_hash)
+
+    report = []
+    for (a, b), shared in pairs.items():
+        score = _score(shared, sizes[a], sizes[b])
+        if score >= min_score:
+            report.append({'a': a, 'b': b, 'shared': shared, 'score': score})
+    report.sort(key=lambda r: r['score'], reverse=True)
+    return {'documents': doc_count, 'pairs': report}
+
+
+def with_students(model, results, id_keys=('id',)):
+    """Add student ids/usernames to result rows with one lookup query"""
+    ids = {row[key] for row in results for key in id_keys}
+    students = {
+        row['id']: {'student': row['student_id'], 'username': row['student__username']}
+        for row in model.objects.filter(id__in=ids).values('id', 'student_id', 'student__username')
+    }
+    for row in results:
+        for key in id_keys:
+            row['student' if key == 'id' else f'{key}_student'] = students.get(row[key])
+    return results
@@ -0,0 +1,98 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}; None when the parameter is absent"""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def select(fields, expandable, only, expand):
+    """
+    Names of `fields` to keep and the (only, expand) spec for each nested
+    field. With `only`, only the listed fields stay (expandable ones may
+    also be named in `expand`); without it every field stays, except that
+    expandable fields not named in a given `expand` are dropped.
+    """
+    kept = {}
+    for name in fields:
+        if only is not None:
+            keep = name in only or (expand is not None and name in expand and name in expandable)
+        else:
+            keep = name not in expandable or expand is None or name in expand
+        if keep:
+            kept[name] = (
+                (only or {}).get(name) or None,
+                None if expand is None else expand.get(name, {}),
+            )
+    return kept
+
+
+def query_plan(serializer):
+    """
+    What a queryset must load for the serializer's current fields:
+    (only, select_related, prefetch_related). `only` is None when some
+    field reads something that cannot be worked out from its source (a
+    method field without Meta.field_requires, a model property, ...).
+    """
+    model = serializer.Meta.model
+    requires = getattr(serializer.Meta, 'field_requires', {})
+    only, related, prefetch = {model._meta.pk.name}, set(), set()
+    exact = True
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in requires:
+            for path in requires[name]:
+                if '__' in path:
+                    related.add(path)
+                only.add(path.split('__')[0])
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            exact = False
+            continue
+        attr = field.source_attrs[0]
+        if attr == 'pk':
+            continue
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            exact = False
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.add(model_field.name)
+            continue
+        if model_field.concrete:
+            only.add(model_field.name)
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if model_field.is_relation and (len(field.source_attrs) > 1 or isinstance(nested, serializers.BaseSerializer)):
+            related.add(model_field.name)
+            if isinstance(nested, serializers.ModelSerializer):
+                _, deeper, _ = query_plan(nested)
+                related.update(f'{model_field.name}__{path}' for path in deeper)
+    return (only if exact else None), related, prefetch
+
+
+def plan_queryset(queryset, serializer, narrow=False):
+    """
+    Apply query_plan to a queryset: select_related / prefetch_related for
+    what the fields read and, when `narrow` (the client picked fields),
+    only() as well.
+    """
+    only, related, prefetch = query_plan(serializer)
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    selected = queryset.query.select_related
+    if narrow and only is not None and selected is not True:
+        queryset = queryset.only(*only, *(selected or {}))
+    return queryset
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from . import sparse
+from .renderers import FastJSONRenderer
+
+
+CHUNK_SIZE = 500  # rows fetched, serialized and encoded at a time
+
+
+def serialized_chunks(serializer_class, queryset, context=None, chunk_size=CHUNK_SIZE):
+    """
+    Serialize a queryset `chunk_size` rows at a time. Rows come from
+    .iterator(), so neither the queryset cache nor a full serializer.data
+    list is ever built; related rows are joined or prefetched per chunk as
+    the serializer's fields need (see sparse.plan_queryset). Pass a
+    Model.objects queryset: rows from a related manager (course.enrollments)
+    get the parent assigned, which reads a foreign key only() may defer.
+    """
+    context = context or {}
+    request = context.get('request')
+    params = request.query_params if request is not None else {}
+    queryset = sparse.plan_queryset(
+        queryset, serializer_class(context=context), 'fields' in params or 'expand' in params,
+    )
+    # to_representation() rather than .data: ReturnList points back at its
+    # serializer, a cycle that would keep every chunk alive until a full GC
+    serializer = serializer_class(many=True, context=context)
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield serializer.to_representation(chunk)
+
+
+def json_array(chunks):
+    """Encode lists of rows as the bytes of a single JSON array, chunk by chunk"""
+    renderer = FastJSONRenderer()
+    yield b'['
+    separator = b''
+    for chunk in chunks:
+        if chunk:
+            yield separator + renderer.render(chunk)[1:-1]
+            separator = b','
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    An unpaginated list as a JSON array, written while the rows are read.
+    Peak memory is one chunk of rows however long the list; the body is the
+    same as Response(serializer.data) would render.
+    """
+
+    def __init__(self, serializer_class, queryset, context=None, chunk_size=CHUNK_SIZE, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(json_array(serialized_chunks(serializer_class, queryset, context, chunk_size)), **kwargs)
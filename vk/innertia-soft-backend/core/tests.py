@@ -1,3 +1,664 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import ClaimsRefreshToken
+from .cache import SQLiteCache
+from .autosave import flush_all
+from .deadlines import close_due_assignments
+from .locks import cache_lock
+from .similarity import similarity_report, top_similar
+from .streaming import StreamingJSONResponse
+from .throttling import UserRateThrottle
+from .token_blacklist import _Bloom
+from .models import (
+    Assignment, Attendance, ClassSession, College, Course, Doubt, DoubtResponse, Enrollment, Note, Program,
+    Slide, Submission, Upload, User,
+)
+from .serializers import AttendanceSerializer, EnrollmentSerializer
+
+
+class BulkGradeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        self.course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        self.assignment = Assignment.objects.create(
+            course=self.course, title='Lists', description='d', status='published',
+            due_date=timezone.now() + timedelta(days=1),
+        )
+        self.submissions = []
+        for i in range(2):
+            student = User.objects.create_user(f'student{i}', password='pw12345678', role='student', college=college)
+            Enrollment.objects.create(student=student, course=self.course)
+            self.submissions.append(
+                Submission.objects.create(student=student, assignment=self.assignment, content='answer')
+            )
+        self.client.force_authenticate(self.faculty)
+
+    def test_bulk_grade_json(self):
+        response = self.client.post('/api/submissions/bulk_grade/', {
+            'assignment': self.assignment.id,
+            'grades': [
+                {'submission': self.submissions[0].id, 'score': 80, 'feedback': 'Good'},
+                {'username': 'student1', 'score': 65},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data, {'graded': 2, 'errors': []})
+        graded = Submission.objects.get(id=self.submissions[0].id)
+        self.assertEqual((graded.score, graded.feedback, graded.status), (80, 'Good', 'graded'))
+
+    def test_numeric_username_does_not_match_a_student_id(self):
+        # A username that is another student's id must grade its own submission
+        other = self.submissions[1].student
+        other.username = str(self.submissions[0].student_id)
+        other.save()
+        response = self.client.post('/api/submissions/bulk_grade/', {
+            'assignment': self.assignment.id,
+            'grades': [{'username': other.username, 'score': 55}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        scores = dict(Submission.objects.values_list('id', 'score'))
+        self.assertEqual((scores[self.submissions[0].id], scores[self.submissions[1].id]), (None, 55))
+
+    def test_bulk_grade_rejects_invalid_rows(self):
+        response = self.client.post('/api/submissions/bulk_grade/', {
+            'assignment': self.assignment.id,
+            'grades': [{'submission': self.submissions[0].id, 'score': 500}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(Submission.objects.get(id=self.submissions[0].id).score)
+
+
+class SubmissionDeadlineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        self.student = User.objects.create_user('student', password='pw12345678', role='student', college=college)
+        Enrollment.objects.create(student=self.student, course=course)
+        self.assignment = Assignment.objects.create(
+            course=course, title='Lists', description='d', status='published',
+            due_date=timezone.now() - timedelta(hours=1),
+        )
+
+    def submit(self):
+        self.client.force_authenticate(self.student)
+        return self.client.post('/api/submissions/', {
+            'student': self.student.id, 'assignment': self.assignment.id, 'content': 'answer',
+        }, format='json')
+
+    def test_late_submission_is_flagged_and_stays_flagged_when_graded(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertTrue(response.data['is_late'])
+
+        self.client.force_authenticate(self.faculty)
+        response = self.client.post(
+            f'/api/submissions/{response.data["id"]}/grade_submission/', {'score': 70}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        submission = Submission.objects.get()
+        self.assertEqual((submission.status, submission.is_late), ('graded', True))
+
+    def test_closed_assignment_rejects_submissions(self):
+        self.assertEqual(close_due_assignments(), (1, 0))
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Submission.objects.exists())
+
+
+class ImageDerivativeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, IMAGE_DERIVATIVE_ROOT=f'{media}/derivatives')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('student', password='pw12345678', role='student')
+        png = io.BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(png, 'PNG')
+        self.user.profile_picture.save('avatar.png', ContentFile(png.getvalue()))
+        self.client.force_authenticate(self.user)
+
+    def test_avatar_is_resized(self):
+        response = self.client.get(f'/api/users/{self.user.id}/avatar/?w=160')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_decompression_bomb_is_refused_not_a_server_error(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            response = self.client.get(f'/api/users/{self.user.id}/avatar/?w=160')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(DOUBT_QUEUE_STREAM_SECONDS=0)
+class DoubtQueueStreamTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        student = User.objects.create_user('student', password='pw12345678', role='student', college=college)
+        Enrollment.objects.create(student=student, course=course)
+        self.session = ClassSession.objects.create(
+            course=course, faculty=self.faculty, session_date=timezone.now(), topic='Lists',
+        )
+        Doubt.objects.create(student=student, session=self.session, question='What is a linked list?')
+        self.url = f'/api/doubts/queue/stream/?session={self.session.id}'
+
+    def stream(self, **headers):
+        self.client.force_authenticate(self.faculty)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', **headers)
+        return response, b''.join(response.streaming_content).decode() if response.streaming else ''
+
+    def test_stream_sends_the_queue_and_skips_it_on_resume(self):
+        response, body = self.stream()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('event: queue', body)
+        event_id = next(line[4:] for line in body.splitlines() if line.startswith('id: '))
+        _, body = self.stream(HTTP_LAST_EVENT_ID=event_id)
+        self.assertNotIn('event: queue', body)
+
+    def test_reconnects_use_their_own_rate_not_the_user_rate(self):
+        rates = {'user': '1/hour', 'doubt_queue_stream': '2/hour'}
+        with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, rates):
+            self.assertEqual(self.stream()[0].status_code, status.HTTP_200_OK)
+            self.assertEqual(self.stream()[0].status_code, status.HTTP_200_OK)
+            self.assertEqual(self.stream()[0].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.client.get('/api/doubts/').status_code, status.HTTP_200_OK)
+
+    async def test_asgi_stream_is_served_asynchronously(self):
+        token = await sync_to_async(lambda: str(ClaimsRefreshToken.for_user(self.faculty).access_token))()
+        response = await AsyncClient().get(
+            self.url, headers={'Accept': 'text/event-stream', 'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: queue', body)
+
+
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media, UPLOAD_TEMP_ROOT=f'{media}/parts')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('student', password='pw12345678', role='student')
+        self.client.force_authenticate(self.user)
+        self.data = b'0123456789' * 100
+
+    def start(self, filename='report.pdf', sha256=''):
+        response = self.client.post('/api/uploads/', {
+            'filename': filename, 'size': len(self.data), 'sha256': sha256,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def send(self, upload_id, offset, data):
+        return self.client.put(
+            f'/api/uploads/{upload_id}/chunk/', data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self, filename='report.pdf'):
+        upload_id = self.start(filename)
+        self.assertEqual(self.send(upload_id, 0, self.data).status_code, status.HTTP_200_OK)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return Upload.objects.get(pk=upload_id)
+
+    def test_resume_rejects_a_wrong_offset_and_accepts_the_right_one(self):
+        upload_id = self.start()
+        self.assertEqual(self.send(upload_id, 0, self.data[:400]).status_code, status.HTTP_200_OK)
+
+        response = self.send(upload_id, 100, self.data[100:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 400)
+
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').data['offset'], 400)
+        self.assertEqual(self.send(upload_id, 400, self.data[400:]).status_code, status.HTTP_200_OK)
+        response = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(response.data['status'], 'complete')
+        with Upload.objects.get(pk=upload_id).file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_identical_bytes_are_stored_once_whatever_the_extension(self):
+        first, second = self.upload('report.PDF'), self.upload('report.pdf')
+        digest = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(first.file.name, f'cas/{digest[:2]}/{digest}')
+        self.assertEqual(second.file.name, first.file.name)
+
+    def test_declared_checksum_of_an_owned_blob_skips_the_bytes(self):
+        self.upload()
+        upload_id = self.start(sha256=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(Upload.objects.get(pk=upload_id).status, 'complete')
+
+
+class SimilarityTests(APITestCase):
+    TEMPLATE = 'def main():\n    # Assignment 3 starter code, do not edit this header\n    data = read_input()\n'
+
+    def setUp(self):
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=faculty, semester=1,
+        )
+        self.assignment = Assignment.objects.create(
+            course=course, title='Lists', description='d', status='published',
+            due_date=timezone.now() + timedelta(days=1),
+        )
+        copied = ' '.join(f'copied{n}' for n in range(40))
+        self.submissions = []
+        for i in range(7):
+            student = User.objects.create_user(f'student{i}', password='pw12345678', role='student', college=college)
+            own = ' '.join(f'student{i}word{n}' for n in range(40))
+            content = self.TEMPLATE + own + (copied if i < 2 else '')
+            self.submissions.append(
+                Submission.objects.create(student=student, assignment=self.assignment, content=content)
+            )
+
+    def test_top_similar_and_report_agree_and_ignore_the_template(self):
+        a, b = self.submissions[0], self.submissions[1]
+        report = similarity_report('submission', 'assignment', self.assignment.id, min_score=0)
+        pair = next(p for p in report['pairs'] if {p['a'], p['b']} == {a.id, b.id})
+        nearest = top_similar('submission', a, 'assignment', k=10)
+
+        self.assertEqual(nearest[0]['id'], b.id)
+        self.assertEqual((nearest[0]['shared'], nearest[0]['score']), (pair['shared'], pair['score']))
+        # Only the template links the others, and it is not counted
+        self.assertEqual([r['id'] for r in nearest], [b.id])
+
+
+class GradebookExportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        self.course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        assignment = Assignment.objects.create(
+            course=self.course, title='-Lists', description='d', status='published',
+            due_date=timezone.now() + timedelta(days=1),
+        )
+        student = User.objects.create_user(
+            '=HYPERLINK("http://evil")', password='pw12345678', role='student', college=college,
+            first_name='@SUM(A1)',
+        )
+        Enrollment.objects.create(student=student, course=self.course)
+        Submission.objects.create(student=student, assignment=assignment, content='answer', score=-1)
+        self.student = student
+        self.client.force_authenticate(self.faculty)
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/gradebook/?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "student_id,username,name,'-Lists")
+        self.assertEqual(lines[1], f'{self.student.id},"\'=HYPERLINK(""http://evil"")",\'@SUM(A1),-1.0')
+
+
+class RefreshRotationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('student', password='pw12345678', role='student')
+
+    def test_a_rotated_refresh_token_cannot_be_replayed(self):
+        tokens = self.client.post(
+            '/api/auth/token/', {'username': 'student', 'password': 'pw12345678'}, format='json',
+        ).data
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        # Still revoked once the cache entry is gone: the database holds the record
+        cache.clear()
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_checks_do_not_wait_for_a_refresh_in_another_thread(self):
+        bloom = _Bloom()
+        bloom.refreshing.acquire()  # as if another thread were scanning the table
+        try:
+            self.assertTrue(bloom.might_contain('unknown'))  # no filter yet: ask the database
+        finally:
+            bloom.refreshing.release()
+        self.assertFalse(bloom.might_contain('unknown'))
+        bloom.add('revoked')
+        self.assertTrue(bloom.might_contain('revoked'))
+
+
+class CacheLockTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lock_is_exclusive_until_released(self):
+        with cache_lock('test-lock'):
+            with self.assertRaises(TimeoutError):
+                with cache_lock('test-lock', timeout=0.05):
+                    pass
+        with cache_lock('test-lock', timeout=0.05):
+            pass
+
+    def test_expired_holder_does_not_release_the_next_holders_lock(self):
+        with cache_lock('test-lock'):
+            cache.set('test-lock', 'next-holder')  # ours expired and another worker took it
+        self.assertEqual(cache.get('test-lock'), 'next-holder')
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        self.course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        self.client.force_authenticate(self.faculty)
+
+    def test_unchanged_list_is_304_until_an_edit(self):
+        etag = self.client.get('/api/courses/')['ETag']
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/courses/{self.course.id}/', {'name': 'Algorithms'}, format='json')
+        response = self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['name'], 'Algorithms')
+
+
+class NoteAutosaveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=faculty, semester=1,
+        )
+        session = ClassSession.objects.create(course=course, faculty=faculty, session_date=timezone.now(), topic='Lists')
+        self.student = User.objects.create_user('student', password='pw12345678', role='student', college=college)
+        self.note = Note.objects.create(student=self.student, session=session, title='Lists', content='hello')
+        self.client.force_authenticate(self.student)
+
+    def autosave(self, base_version, deltas, **extra):
+        return self.client.patch(f'/api/notes/{self.note.id}/autosave/', {
+            'base_version': base_version, 'deltas': deltas, **extra,
+        }, format='json')
+
+    def stored(self):
+        return Note.objects.values_list('content', 'version').get(pk=self.note.id)
+
+    def test_edits_are_coalesced_then_flushed(self):
+        self.assertEqual(self.autosave(0, [{'pos': 5, 'insert': ' world'}]).data['saved'], True)
+        response = self.autosave(1, [{'pos': 0, 'delete': 1, 'insert': 'H'}])
+        self.assertEqual((response.data['version'], response.data['saved']), (2, False))
+        self.assertEqual(self.stored(), ('hello world', 1))  # second edit still buffered
+
+        self.assertEqual(flush_all(max_age=0), 1)
+        self.assertEqual(self.stored(), ('Hello world', 2))
+
+    def test_detail_read_sees_buffered_edits(self):
+        self.autosave(0, [{'pos': 5, 'insert': '!'}])
+        self.autosave(1, [{'pos': 6, 'insert': '!'}])
+        response = self.client.get(f'/api/notes/{self.note.id}/')
+        self.assertEqual((response.data['content'], response.data['version']), ('hello!!', 2))
+
+    def test_stale_base_version_is_a_conflict(self):
+        self.autosave(0, [{'pos': 0, 'insert': 'a'}])
+        response = self.autosave(0, [{'pos': 0, 'insert': 'b'}])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['version'], 1)
+
+    def test_out_of_range_delta_is_rejected(self):
+        response = self.autosave(0, [{'pos': 50, 'delete': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClaimsTokenTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        self.course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=faculty, semester=1,
+        )
+        self.student = User.objects.create_user('student', password='pw12345678', role='student', college=college)
+        self.tokens = self.client.post(
+            '/api/auth/token/', {'username': 'student', 'password': 'pw12345678'}, format='json',
+        ).data
+
+    def me(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get('/api/users/me/')
+
+    def refresh(self):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+
+    def test_role_change_makes_tokens_stale_until_refreshed(self):
+        self.assertEqual(self.me(self.tokens['access']).status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.role = 'faculty'
+            self.student.save()
+
+        response = self.me(self.tokens['access'])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'].code, 'token_stale')
+
+        self.client.credentials()
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'faculty')
+        self.assertEqual(self.me(response.data['access']).data['role'], 'faculty')
+
+    def test_refresh_is_rejected_once_the_user_is_deactivated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.is_active = False
+            self.student.save()
+        self.assertEqual(self.refresh().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.me(self.tokens['access']).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_enrollment_reissues_the_course_claim(self):
+        self.assertEqual(AccessToken(self.tokens['access'])['courses'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertEqual(self.me(self.tokens['access']).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.refresh()
+        self.assertEqual(AccessToken(response.data['access'])['courses'], [self.course.id])
+
+
+def run_threads(target, count=8):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class SQLiteCacheTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache = SQLiteCache(f'{directory}/cache.sqlite3', {})
+
+    def test_values_round_trip_and_expire(self):
+        self.cache.set_many({'n': 3, 'obj': {'a': [1, 2]}, 'short': 'x'}, 60)
+        self.cache.set('short', 'x', 0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.cache.get_many(['n', 'obj', 'short']), {'n': 3, 'obj': {'a': [1, 2]}})
+        self.cache.delete_many(['n', 'obj'])
+        self.assertIsNone(self.cache.get('n'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_add_and_incr_are_atomic_across_connections(self):
+        winners = []
+
+        def work():
+            # Each thread has its own SQLite connection, like separate workers
+            if self.cache.add('lock', 1, 60):
+                winners.append(1)
+            for _ in range(25):
+                if not self.cache.add('counter', 1, 60):
+                    self.cache.incr('counter')
+        run_threads(work)
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(self.cache.get('counter'), 8 * 25)
+
+
+class AtomicThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='pw12345678', role='student')
+
+    def test_concurrent_requests_cannot_exceed_the_rate(self):
+        request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=self.user.pk))
+        allowed = []
+        with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'user': '5/minute'}):
+            run_threads(lambda: allowed.extend(
+                UserRateThrottle().allow_request(request, None) for _ in range(3)
+            ))
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_over_the_rate_is_429_with_retry_after(self):
+        self.client.force_authenticate(self.user)
+        with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'user': '2/minute'}):
+            codes = [self.client.get('/api/users/me/').status_code for _ in range(3)]
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertLessEqual(int(response['Retry-After']), 60)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        self.session = ClassSession.objects.create(
+            course=course, faculty=self.faculty, session_date=timezone.now(), topic='Lists',
+        )
+        self.slide = Slide.objects.create(session=self.session, slide_number=1, title='Linked lists', content='c')
+        self.college = college
+        self.client.force_authenticate(self.faculty)
+
+    def add_doubts(self, count):
+        for _ in range(count):
+            n = Doubt.objects.count()
+            student = User.objects.create_user(f'student{n}', password='pw12345678', role='student', college=self.college)
+            doubt = Doubt.objects.create(student=student, session=self.session, question=f'Question {n}?')
+            DoubtResponse.objects.create(doubt=doubt, answer='Answer', source_slide=self.slide)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, captured.captured_queries
+
+    def test_expanded_doubt_list_query_count_does_not_grow_with_rows(self):
+        url = f'/api/doubts/?session={self.session.id}&expand=response'
+        self.add_doubts(2)
+        response, few = self.queries(url)
+        self.assertEqual(response.data['results'][0]['response']['slide_title'], 'Linked lists')
+        self.add_doubts(6)
+        _, many = self.queries(url)
+        self.assertEqual(len(many), len(few))
+
+    def test_fields_narrow_the_body_and_the_query(self):
+        self.add_doubts(2)
+        response, queries = self.queries(f'/api/doubts/?session={self.session.id}&fields=id,status')
+        self.assertEqual([set(row) for row in response.data['results']], [{'id', 'status'}] * 2)
+        listing = [q['sql'] for q in queries if 'FROM "doubts"' in q['sql'] and 'COUNT' not in q['sql']]
+        self.assertTrue(listing)
+        self.assertNotIn('"question"', listing[-1])
+
+    def test_empty_expand_drops_expandable_fields(self):
+        self.add_doubts(1)
+        response, _ = self.queries(f'/api/doubts/?session={self.session.id}&expand=')
+        row = response.data['results'][0]
+        self.assertNotIn('response', row)
+        self.assertIn('question', row)
+
+
+class StreamingReportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        college = College.objects.create(name='College', code='C1', address='a', city='x', country='y')
+        program = Program.objects.create(name='CS', code='CS', college=college)
+        self.faculty = User.objects.create_user('faculty', password='pw12345678', role='faculty', college=college)
+        self.course = Course.objects.create(
+            code='CS101', name='Data Structures', description='d', program=program, faculty=self.faculty, semester=1,
+        )
+        self.session = ClassSession.objects.create(
+            course=self.course, faculty=self.faculty, session_date=timezone.now(), topic='Lists',
+        )
+        for i in range(5):
+            student = User.objects.create_user(f'student{i}', password='pw12345678', role='student', college=college)
+            Enrollment.objects.create(student=student, course=self.course)
+            Attendance.objects.create(student=student, session=self.session, status='present', active_minutes=i)
+        self.client.force_authenticate(self.faculty)
+
+    def body(self, response):
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_streamed_body_matches_the_serializer(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/enrolled_students/')
+        expected = EnrollmentSerializer(Enrollment.objects.order_by('id'), many=True).data
+        self.assertEqual(self.body(response), json.loads(json.dumps(expected, cls=DjangoJSONEncoder)))
+
+    def test_rows_split_across_chunks_form_one_array(self):
+        chunked = StreamingJSONResponse(AttendanceSerializer, Attendance.objects.order_by('id'), chunk_size=2)
+        rows = self.body(chunked)
+        self.assertEqual([row['active_minutes'] for row in rows], [0, 1, 2, 3, 4])
+        empty = StreamingJSONResponse(AttendanceSerializer, Attendance.objects.none(), chunk_size=2)
+        self.assertEqual(self.body(empty), [])
+
+    def test_fields_apply_to_streamed_reports(self):
+        response = self.client.get(f'/api/sessions/{self.session.id}/attendance_report/?fields=id,status')
+        self.assertEqual({tuple(sorted(row)) for row in self.body(response)}, {('id', 'status')})
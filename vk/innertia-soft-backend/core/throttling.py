@@ -0,0 +1,55 @@
+from rest_framework import throttling
+
+
+class AtomicRateThrottleMixin:
+    """
+    Fixed-window counter kept with cache add()/incr() instead of DRF's
+    read-modify-write request history, so concurrent workers sharing the
+    cache cannot both slip under the limit.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f'{self.key}:{window}'
+        # A counter that expires between add() and incr() is simply re-added
+        for _ in range(2):
+            if self.cache.add(key, 1, self.duration + 1):
+                count = 1
+                break
+            try:
+                count = self.cache.incr(key)
+                break
+            except ValueError:
+                continue
+        else:
+            return True
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(self.window_end - self.now, 0)
+
+
+class AnonRateThrottle(AtomicRateThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(AtomicRateThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(AtomicRateThrottleMixin, throttling.ScopedRateThrottle):
+    def allow_request(self, request, view):
+        # DRF's version reads the view's scope before counting; do the same
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
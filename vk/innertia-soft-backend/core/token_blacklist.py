@@ -0,0 +1,160 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+REVOKED_KEY = 'token-revoked:{}'
+BLOOM_CAPACITY = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+BLOOM_SYNC_SECONDS = 30         # pull rows other workers wrote
+BLOOM_REBUILD_SECONDS = 60 * 60  # start over so pruned tokens drop out
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        a, b = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class _Bloom:
+    """
+    Per-process filter of blacklisted jtis, kept in step with the table.
+    The table is read with no lock held: one thread refreshes while the
+    rest keep answering from the current filter, and a rebuilt filter is
+    swapped in whole.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()        # guards the fields below, held only briefly
+        self.refreshing = threading.Lock()  # at most one thread reads the table
+        self.filter = None
+        self.last_id = 0
+        self.synced_at = 0
+        self.built_at = 0
+        self.added = None  # jtis added while a rebuild runs, replayed into the new filter
+
+    def refresh(self):
+        if not self.refreshing.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            with self.lock:
+                rebuild = self.filter is None or now - self.built_at >= BLOOM_REBUILD_SECONDS
+                last_id = 0 if rebuild else self.last_id
+                if rebuild:
+                    self.added = []
+            target = BloomFilter(BLOOM_CAPACITY, BLOOM_ERROR_RATE) if rebuild else None
+            new = []
+            for row_id, jti in BlacklistedToken.objects.filter(id__gt=last_id) \
+                    .order_by('id').values_list('id', 'token__jti').iterator(chunk_size=5000):
+                if rebuild:
+                    target.add(jti)
+                else:
+                    new.append(jti)
+                last_id = row_id
+            with self.lock:
+                if rebuild:
+                    new, self.added = self.added, None
+                    self.filter, self.built_at = target, now
+                for jti in new:
+                    self.filter.add(jti)
+                self.last_id, self.synced_at = last_id, now
+        finally:
+            with self.lock:
+                self.added = None
+            self.refreshing.release()
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+            if self.added is not None:
+                self.added.append(jti)
+
+    def might_contain(self, jti):
+        if self.filter is None or time.monotonic() - self.synced_at >= BLOOM_SYNC_SECONDS:
+            self.refresh()
+        with self.lock:
+            # Until the first build finishes every token is a possible hit
+            return self.filter is None or jti in self.filter
+
+
+_bloom = _Bloom()
+
+
+def is_blacklisted(jti):
+    """
+    Check a refresh token's jti. Recent revocations are found in the cache;
+    the Bloom filter answers "no" for almost every live token without a
+    query; only possible hits reach the database.
+    """
+    if cache.get(REVOKED_KEY.format(jti)):
+        return True
+    if not _bloom.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def blacklist(jti, token, exp, user_id):
+    """
+    Revoke a refresh token. The BlacklistedToken row is written before this
+    returns: the database is the record of the revocation, the cache only
+    a fast path that eviction cannot undo. Returns False when the token had
+    already been revoked (e.g. a replayed refresh).
+    """
+    ttl = max(int(exp - time.time()), 1)
+    if not cache.add(REVOKED_KEY.format(jti), 1, ttl):
+        return False
+    _bloom.add(jti)
+    # Usually created when the token was issued
+    outstanding_id = OutstandingToken.objects.filter(jti=jti).values_list('id', flat=True).first()
+    if outstanding_id is None:
+        outstanding, _ = OutstandingToken.objects.get_or_create(jti=jti, defaults={
+            'token': token, 'expires_at': datetime_from_epoch(exp), 'user_id': user_id,
+        })
+        outstanding_id = outstanding.id
+    _, created = BlacklistedToken.objects.get_or_create(token_id=outstanding_id)
+    return created
+
+
+def prune_expired(batch_size=1000, pause=0.0):
+    """
+    Delete expired outstanding tokens and their blacklist rows in small
+    batches, each its own short transaction, so neither table is locked for
+    long. Returns the number of outstanding tokens deleted.
+    """
+    cutoff = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=cutoff).order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Upload
+
+
+READ_SIZE = 64 * 1024
+CHUNK_SUFFIX = '.chunk'  # A received chunk waiting to be appended
+
+
+class UploadError(Exception):
+    """Raised for protocol violations; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+def _part_path(upload):
+    return os.path.join(settings.UPLOAD_TEMP_ROOT, f'{upload.pk}.part')
+
+
+def cas_name(sha256):
+    """Storage name for a blob: cas/ab/abcdef..., the same whatever the file was called"""
+    return f'cas/{sha256[:2]}/{sha256}'
+
+
+def start_upload(user, filename, size, sha256=''):
+    """
+    Open an upload. When the same user already completed an upload with this
+    checksum and size, it completes immediately without any bytes being sent.
+    Other users' blobs are only shared after complete_upload has hashed the
+    bytes they sent, so a declared checksum never grants access to a file.
+    """
+    if size < 0 or size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'Size must be between 0 and {settings.UPLOAD_MAX_SIZE} bytes')
+    filename = os.path.basename(filename)[:255] or 'upload'
+    sha256 = (sha256 or '').lower()
+
+    upload = Upload(user=user, filename=filename, size=size, sha256=sha256)
+    owned = sha256 and Upload.objects.filter(
+        user=user, sha256=sha256, size=size, status='complete', file__startswith='cas/',
+    ).values_list('file', flat=True).first()
+    if owned and default_storage.exists(owned):
+        upload.status = 'complete'
+        upload.received_bytes = size
+        upload.file.name = owned
+    upload.save()
+    return upload
+
+
+def _check_chunk(upload, offset, length):
+    if upload.status != 'pending':
+        raise UploadError('Upload already complete', status_code=409, offset=upload.received_bytes)
+    if offset != upload.received_bytes:
+        raise UploadError('Offset mismatch', status_code=409, offset=upload.received_bytes)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared size', offset=upload.received_bytes)
+
+
+def _receive(stream, length, directory):
+    """Copy `length` bytes of the request body to a temp file; returns its path, or None if cut short"""
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=CHUNK_SUFFIX)
+    remaining = length
+    with os.fdopen(fd, 'wb') as out:
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            out.write(data)
+            remaining -= len(data)
+    if remaining:
+        os.remove(path)
+        return None
+    return path
+
+
+def write_chunk(upload_id, user, offset, stream, length):
+    """
+    Append one chunk at `offset`. The body is read from the client into a
+    temp file first, with no lock held; only the offset check and the local
+    append run inside the row lock. A mismatched offset raises UploadError
+    with the offset to resume from.
+    """
+    if length is None or length <= 0:
+        raise UploadError('Content-Length is required')
+    if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(f'Chunks may not exceed {settings.UPLOAD_CHUNK_MAX_SIZE} bytes', status_code=413)
+
+    # Refuse a bad offset before reading the body; rechecked under the lock
+    upload = Upload.objects.get(pk=upload_id, user=user)
+    _check_chunk(upload, offset, length)
+    chunk_path = _receive(stream, length, settings.UPLOAD_TEMP_ROOT)
+    if chunk_path is None:
+        raise UploadError('Connection closed mid-chunk', offset=upload.received_bytes)
+    try:
+        with transaction.atomic():
+            upload = Upload.objects.select_for_update().get(pk=upload_id, user=user)
+            _check_chunk(upload, offset, length)
+
+            path = _part_path(upload)
+            on_disk = os.path.getsize(path) if os.path.exists(path) else 0
+            rewind_to = None
+            if on_disk < offset:
+                # Part file was lost or truncated; rewind the client to what survived
+                rewind_to = upload.received_bytes = on_disk
+            else:
+                with open(path, 'ab') as part, open(chunk_path, 'rb') as chunk:
+                    # Drop bytes left over from an interrupted earlier attempt
+                    part.truncate(offset)
+                    shutil.copyfileobj(chunk, part, READ_SIZE)
+                upload.received_bytes = offset + length
+            upload.save(update_fields=['received_bytes', 'updated_at'])
+    finally:
+        os.remove(chunk_path)
+
+    if rewind_to is not None:
+        raise UploadError('Stored data is shorter than expected', status_code=409, offset=rewind_to)
+    return upload
+
+
+def complete_upload(upload_id, user):
+    """Verify size and checksum, then move the file into content-addressed storage"""
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().get(pk=upload_id, user=user)
+        if upload.status == 'complete':
+            return upload
+        if upload.received_bytes != upload.size:
+            raise UploadError('Upload is incomplete', status_code=409, offset=upload.received_bytes)
+
+        path = _part_path(upload)
+        if upload.size == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'ab').close()
+        sha = hashlib.sha256()
+        with open(path, 'rb') as part:
+            for data in iter(lambda: part.read(READ_SIZE), b''):
+                sha.update(data)
+        digest = sha.hexdigest()
+
+        corrupt = bool(upload.sha256) and upload.sha256 != digest
+        if corrupt:
+            # Start over from zero rather than keep bad bytes around
+            os.remove(path)
+            upload.received_bytes = 0
+            upload.save(update_fields=['received_bytes', 'updated_at'])
+        else:
+            name = cas_name(digest)
+            target = default_storage.path(name)
+            if os.path.exists(target):
+                os.remove(path)  # Identical content is already stored
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+            upload.sha256 = digest
+            upload.file.name = name
+            upload.status = 'complete'
+            upload.save(update_fields=['sha256', 'file', 'status', 'updated_at'])
+
+    if corrupt:
+        raise UploadError('Checksum mismatch; upload restarted', status_code=422, offset=0)
+    return upload
+
+
+def prune_chunks(cutoff):
+    """Remove received chunks a killed worker never appended, older than `cutoff` (epoch seconds)"""
+    removed = 0
+    if not os.path.isdir(settings.UPLOAD_TEMP_ROOT):
+        return removed
+    for entry in os.scandir(settings.UPLOAD_TEMP_ROOT):
+        if entry.name.endswith(CHUNK_SUFFIX) and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def discard_part(upload):
+    path = _part_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
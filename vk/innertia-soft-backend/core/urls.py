@@ -1,16 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
-    CustomTokenObtainPairView, UserViewSet,
+    CustomTokenObtainPairView, CustomTokenRefreshView, UserViewSet,
     CollegeViewSet, ProgramViewSet, CourseViewSet, EnrollmentViewSet,
     ClassSessionViewSet, AttendanceViewSet,
     FocusLogViewSet, ViolationViewSet,
     SlideViewSet, NoteViewSet,
     DoubtViewSet, DoubtResponseViewSet,
     AssignmentViewSet, SubmissionViewSet,
-    SessionReportViewSet, StudentPerformanceViewSet,
-    CompileCodeView, CompilerSubmissionViewSet, ScreenLockViewSet
+    SessionReportViewSet, StudentPerformanceViewSet, AnalyticsExportViewSet,
+    CompileCodeView, CompilerSubmissionViewSet, ScreenLockViewSet, UploadViewSet
 )
 
 router = DefaultRouter()
@@ -43,10 +42,12 @@ router.register(r'doubt-responses', DoubtResponseViewSet, basename='doubt-respon
 # Assessment routes
 router.register(r'assignments', AssignmentViewSet, basename='assignment')
 router.register(r'submissions', SubmissionViewSet, basename='submission')
+router.register(r'uploads', UploadViewSet, basename='upload')
 
 # Analytics routes
 router.register(r'session-reports', SessionReportViewSet, basename='session-report')
 router.register(r'student-performance', StudentPerformanceViewSet, basename='student-performance')
+router.register(r'analytics-export', AnalyticsExportViewSet, basename='analytics-export')
 
 # Compiler & Execution routes
 router.register(r'compiler-submissions', CompilerSubmissionViewSet, basename='compiler-submission')
@@ -56,7 +57,7 @@ router.register(r'compile', CompileCodeView, basename='compile')
 urlpatterns = [
     # Auth endpoints
     path('auth/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     
     # API routes
     path('', include(router.urls)),
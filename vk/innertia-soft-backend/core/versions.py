@@ -0,0 +1,27 @@
+import uuid
+
+from django.core.cache import cache
+
+
+STAMP_KEY = 'version:{}'
+
+
+def model_scope(model):
+    """Scope bumped on every save or delete of a model (see signals.refresh_model_version)"""
+    return f'model:{model._meta.label_lower}'
+
+
+def bump(*scopes):
+    """Give each scope a new random stamp; anything keyed by the old one goes stale"""
+    cache.set_many({STAMP_KEY.format(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+def current(scopes):
+    """Stamps of several scopes in one cache round trip; missing ones are created"""
+    keys = [STAMP_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
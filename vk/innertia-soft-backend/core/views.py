@@ -1,43 +1,180 @@
-from rest_framework import viewsets, status, permissions, filters
+from rest_framework import viewsets, mixins, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from asgiref.sync import sync_to_async
 from django.db.models import Q, Avg
 from django.db import models
+import asyncio
+import hashlib
 import subprocess
+import csv
 import json
+import tempfile
+import time
 from .models import (
     College, Program, Course, Enrollment, ClassSession, Attendance,
     FocusLog, Violation, Slide, Note, Doubt, DoubtResponse, Assignment,
-    Submission, SessionReport, StudentPerformance, CompilerSubmission, ScreenLock
+    Submission, SessionReport, StudentPerformance, CompilerSubmission, ScreenLock, Upload
 )
 from .serializers import (
-    CustomTokenObtainPairSerializer, UserSerializer, UserRegistrationSerializer,
+    CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, UserSerializer, UserRegistrationSerializer,
     CollegeSerializer, ProgramSerializer, CourseSerializer, EnrollmentSerializer,
     ClassSessionSerializer, AttendanceSerializer, FocusLogSerializer, ViolationSerializer,
-    SlideSerializer, NoteSerializer, DoubtSerializer, DoubtResponseSerializer,
+    SlideSerializer, NoteSerializer, NoteAutosaveSerializer, DoubtSerializer, DoubtResponseSerializer,
     AssignmentSerializer, SubmissionSerializer, SessionReportSerializer,
     StudentPerformanceSerializer, CompilerSubmissionSerializer, ScreenLockSerializer,
-    ExecuteCodeSerializer
+    ExecuteCodeSerializer, UploadSerializer
 )
 from .permissions import (
     IsSuperAdmin, IsCollegeAdmin, IsFaculty, IsFacultyOrAdmin, IsStudent,
     IsOwnerOrAdmin, IsOwner, CanManageEnrollment, CanMarkAttendance, CanViewSession
 )
+from .throttling import ScopedRateThrottle
 from .filters import (
     CollegeFilter, ProgramFilter, CourseFilter, EnrollmentFilter,
     ClassSessionFilter, AttendanceFilter, ViolationFilter, FocusLogFilter,
     SlideFilter, NoteFilter, DoubtFilter, AssignmentFilter, SubmissionFilter,
     StudentPerformanceFilter
 )
+from .images import DerivativeError, get_derivative, nearest_width
+from .glossary import course_glossary, course_question_bank
+from .autosave import StaleVersion, autosave, discard_buffer, flush_pending, flush_student
+from .doubt_queue import current_stamp, get_queue
+from . import live_state, reference, sparse, versions
+from .signals import VERSIONED_MODELS
+from .renderers import (
+    ArrowRenderer, CSVRenderer, EventStreamRenderer, FastJSONRenderer, JSONLinesRenderer, ParquetRenderer,
+)
+from .grading import bulk_grade, read_csv_rows
+from .negotiation import DownloadContentNegotiation
+from .streaming import StreamingJSONResponse
+from .uploads import UploadError, complete_upload, discard_part, start_upload, write_chunk
+from .similarity import similarity_report, top_similar, with_students
+from .exports import (
+    attendance_columns, attendance_rows, gradebook_columns, gradebook_rows,
+    stream_csv, stream_jsonl,
+)
+from .columnar import DATASETS, FORMATS, ExportUnavailable, export_dataset, parse_bound
+from .performance import recompute as recompute_performance
+from .distributions import METRICS as DISTRIBUTION_METRICS, course_distribution, standings
+from .authentication import request_course_ids
 
 User = get_user_model()
 
 
+def number_param(request, name, default, minimum=None, maximum=None):
+    """Read a numeric query parameter, clamped, falling back to default on bad input"""
+    try:
+        value = type(default)(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    if minimum is not None:
+        value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+def image_derivative_response(request, field_file):
+    """Serve a cached resized variant of an image field with long-lived cache headers"""
+    width = nearest_width(request.query_params.get('w'))
+    try:
+        path, etag = get_derivative(field_file, width)
+    except DerivativeError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    quoted_etag = f'"{etag}"'
+    if request.headers.get('If-None-Match') == quoted_etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['ETag'] = quoted_etag
+    patch_cache_control(response, private=True, max_age=settings.IMAGE_DERIVATIVE_MAX_AGE, immutable=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match for list and retrieve. The tag is built from version
+    stamps (etag_scopes) plus whatever else decides what this user sees
+    (etag_vary), never from the body, so a matching tag answers 304 before
+    the queryset runs. By default the stamp is the queryset model's, bumped
+    on every save or delete once the model is listed in
+    signals.VERSIONED_MODELS; override etag_scopes when the serializer also
+    shows other models' rows.
+    """
+
+    def etag_scopes(self, request):
+        model = self.queryset.model if self.queryset is not None else self.get_queryset().model
+        if model not in VERSIONED_MODELS:
+            # Otherwise the stamp would never change and every tag would match
+            raise ImproperlyConfigured(
+                f'{type(self).__name__}: add {model.__name__} to signals.VERSIONED_MODELS or override etag_scopes'
+            )
+        return [versions.model_scope(model)]
+
+    def etag_vary(self, request):
+        return [request.user.pk, request.user.role]
+
+    def _etag(self, request):
+        parts = [
+            self.basename, self.action, request.get_host(), request.get_full_path(),
+            request.headers.get('Accept', ''), *self.etag_vary(request),
+            *versions.current(self.etag_scopes(request)),
+        ]
+        return '"%s"' % hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        etag = self._etag(request)
+        # Weak comparison: compression turns the tag sent out into W/"..."
+        if etag in {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}:
+            response = HttpResponseNotModified()
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+
+class SparseQuerysetMixin:
+    """
+    Loads what the serializer will read for list/retrieve: select_related
+    and prefetch_related from its fields, and only() on lists when the
+    client asked for a subset with ?fields= / ?expand=.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'retrieve') or self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'Meta'):
+            return queryset
+        params = self.request.query_params
+        narrow = self.action == 'list' and ('fields' in params or 'expand' in params)
+        return sparse.plan_queryset(queryset, serializer, narrow)
+
 # ======================
 # Auth Views
 # ======================
@@ -46,7 +183,11 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
+
+class UserViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -83,6 +224,13 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def avatar(self, request, pk=None):
+        """Get a resized profile picture (?w=160|320|640|1280)"""
+        # Any signed-in user may see avatars, not only the profile owner
+        user = get_object_or_404(User, pk=pk)
+        return image_derivative_response(request, user.profile_picture)
+    
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def register(self, request):
         """Register new user"""
@@ -97,7 +245,7 @@ class UserViewSet(viewsets.ModelViewSet):
 # Institution ViewSets
 # ======================
 
-class CollegeViewSet(viewsets.ModelViewSet):
+class CollegeViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = College.objects.all()
     serializer_class = CollegeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -114,7 +262,7 @@ class CollegeViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -131,7 +279,7 @@ class ProgramViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -141,14 +289,17 @@ class CourseViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'semester', 'created_at']
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'enrolled_students']:
+        if self.action in ['list', 'retrieve', 'enrolled_students', 'glossary', 'question_bank']:
             return [permissions.IsAuthenticated()]
-        elif self.action in ['enroll_student']:
+        elif self.action in ['enroll_student', 'gradebook', 'attendance_matrix', 'distribution']:
             return [IsFacultyOrAdmin()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsFacultyOrAdmin()]
         return [permissions.IsAuthenticated()]
     
+    def etag_scopes(self, request):
+        return [reference.scope('course'), reference.scope('program')]
+    
     @action(detail=True, methods=['post'])
     def enroll_student(self, request, pk=None):
         """Enroll a student in a course"""
@@ -180,14 +331,78 @@ class CourseViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def enrolled_students(self, request, pk=None):
-        """Get all enrolled students in a course"""
+        """Get all enrolled students in a course (streamed, unpaginated)"""
         course = self.get_object()
-        enrollments = course.enrollments.filter(status='active')
-        serializer = EnrollmentSerializer(enrollments, many=True)
-        return Response(serializer.data)
+        enrollments = Enrollment.objects.filter(course=course, status='active').order_by('id')
+        return StreamingJSONResponse(EnrollmentSerializer, enrollments, self.get_serializer_context())
+    
+    @action(detail=True, methods=['get'])
+    def glossary(self, request, pk=None):
+        """Get every key term defined across the course's slides (?term= to look one up)"""
+        course = self.get_object()
+        return Response(course_glossary(course, term=request.query_params.get('term')))
+    
+    @action(detail=True, methods=['get'])
+    def question_bank(self, request, pk=None):
+        """Get deduplicated probable exam questions across the course's slides"""
+        course = self.get_object()
+        return Response(course_question_bank(course))
+    
+    @action(detail=True, methods=['get'])
+    def distribution(self, request, pk=None):
+        """
+        Histogram, quantiles and mean/std of ?metric=attendance|scores|focus across the course.
+        ?student= adds that student's percentile and z-score; ?standings=true adds every student's.
+        """
+        course = self.get_object()
+        if request.user.role == 'faculty' and course.faculty_id != request.user.id:
+            return Response({'detail': 'You do not teach this course'}, status=status.HTTP_403_FORBIDDEN)
+        metric = request.query_params.get('metric', 'attendance')
+        if metric not in DISTRIBUTION_METRICS:
+            return Response(
+                {'detail': f'metric must be one of: {", ".join(DISTRIBUTION_METRICS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        data = course_distribution(course, metric)
+        result = {'course': course.id, 'metric': metric, **data['summary']}
+        student_id = number_param(request, 'student', 0)
+        if student_id:
+            found = standings(data, student_id)
+            if not found:
+                return Response({'detail': 'No data for this student in the course'}, status=status.HTTP_404_NOT_FOUND)
+            result['student'] = found[0]
+        if request.query_params.get('standings') in ('1', 'true'):
+            result['standings'] = standings(data)
+        return Response(result)
+    
+    def _export(self, request, name, columns_for, rows_for, key):
+        course = self.get_object()
+        if request.user.role == 'faculty' and course.faculty_id != request.user.id:
+            return Response({'detail': 'You do not teach this course'}, status=status.HTTP_403_FORBIDDEN)
+        columns = columns_for(course)
+        rows = rows_for(course, columns)
+        if request.accepted_renderer.format == 'jsonl':
+            body, content_type, ext = stream_jsonl(columns, rows, key), 'application/jsonl', 'jsonl'
+        else:
+            body, content_type, ext = stream_csv(columns, rows), 'text/csv', 'csv'
+        response = StreamingHttpResponse(body, content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{course.code}-{name}.{ext}"'
+        return response
+    
+    @action(detail=True, methods=['get'], renderer_classes=[CSVRenderer, JSONLinesRenderer],
+            content_negotiation_class=DownloadContentNegotiation)
+    def gradebook(self, request, pk=None):
+        """Stream the course gradebook, students x assignments (?format=csv or jsonl)"""
+        return self._export(request, 'gradebook', gradebook_columns, gradebook_rows, 'scores')
+    
+    @action(detail=True, methods=['get'], renderer_classes=[CSVRenderer, JSONLinesRenderer],
+            content_negotiation_class=DownloadContentNegotiation)
+    def attendance_matrix(self, request, pk=None):
+        """Stream attendance status, students x sessions (?format=csv or jsonl)"""
+        return self._export(request, 'attendance', attendance_columns, attendance_rows, 'attendance')
 
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -216,7 +431,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
 # Session & Attendance ViewSets
 # ======================
 
-class ClassSessionViewSet(viewsets.ModelViewSet):
+class ClassSessionViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = ClassSession.objects.all()
     serializer_class = ClassSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -231,17 +446,25 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
             return ClassSession.objects.filter(faculty=user)
         elif user.role == 'student':
             # Student can only see sessions for their enrolled courses
-            return ClassSession.objects.filter(
-                course__enrollments__student=user,
-                course__enrollments__status='active'
-            ).distinct()
+            return ClassSession.objects.filter(course_id__in=request_course_ids(self.request))
         return ClassSession.objects.all()
     
+    def etag_scopes(self, request):
+        return ['sessions', reference.scope('course')]
+    
+    def etag_vary(self, request):
+        vary = super().etag_vary(request)
+        if request.user.role == 'student':
+            vary.append(sorted(request_course_ids(request)))
+        return vary
+    
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'attendance_report']:
             return [permissions.IsAuthenticated()]
-        elif self.action in ['start_session', 'end_session']:
+        elif self.action in ['start_session', 'end_session', 'dashboard']:
             return [IsFacultyOrAdmin()]
+        elif self.action == 'heartbeat':
+            return [IsStudent()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsFacultyOrAdmin()]
         return [permissions.IsAuthenticated()]
@@ -266,14 +489,42 @@ class ClassSessionViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def attendance_report(self, request, pk=None):
-        """Get attendance report for a session"""
+        """Get attendance report for a session (streamed, unpaginated)"""
         session = self.get_object()
-        attendance = session.attendance.all()
-        serializer = AttendanceSerializer(attendance, many=True)
-        return Response(serializer.data)
+        attendance = Attendance.objects.filter(session=session)
+        return StreamingJSONResponse(AttendanceSerializer, attendance, self.get_serializer_context())
+    
+    def _live_state(self, pk):
+        try:
+            state = live_state.get_state(int(pk))
+        except (TypeError, ValueError):
+            state = None
+        if state is None:
+            raise NotFound('Session not found')
+        return state
+    
+    @action(detail=True, methods=['get'])
+    def dashboard(self, request, pk=None):
+        """
+        Live state of every student (focus, lock, open violations, last heartbeat).
+        Pass the returned version as ?since= to get only the students that changed.
+        Served from the in-memory store without touching the database.
+        """
+        state = self._live_state(pk)
+        if request.user.role == 'faculty' and state['faculty'] != request.user.id:
+            raise PermissionDenied('You do not teach this session')
+        return Response(live_state.snapshot(state, since=number_param(request, 'since', 0, minimum=0)))
+    
+    @action(detail=True, methods=['post'])
+    def heartbeat(self, request, pk=None):
+        """Tell the live dashboard this student's client is still connected"""
+        self._live_state(pk)
+        if not live_state.heartbeat(int(pk), request.user.id):
+            raise PermissionDenied('You are not enrolled in this session')
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -346,7 +597,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 # Focus & Violation ViewSets
 # ======================
 
-class FocusLogViewSet(viewsets.ModelViewSet):
+class FocusLogViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = FocusLog.objects.all()
     serializer_class = FocusLogSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -380,7 +631,7 @@ class FocusLogViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ViolationViewSet(viewsets.ModelViewSet):
+class ViolationViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Violation.objects.all()
     serializer_class = ViolationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -418,7 +669,7 @@ class ViolationViewSet(viewsets.ModelViewSet):
 # Content & Material ViewSets
 # ======================
 
-class SlideViewSet(viewsets.ModelViewSet):
+class SlideViewSet(ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Slide.objects.all()
     serializer_class = SlideSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -427,49 +678,161 @@ class SlideViewSet(viewsets.ModelViewSet):
     ordering_fields = ['slide_number']
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'image']:
             return [permissions.IsAuthenticated()]
         elif self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsFacultyOrAdmin()]
         return [permissions.IsAuthenticated()]
+    
+    def etag_scopes(self, request):
+        session_id = request.query_params.get('session', '')
+        return [f'slides:{session_id}'] if session_id.isdigit() and self.action == 'list' else ['slides']
+    
+    @action(detail=True, methods=['get'])
+    def image(self, request, pk=None):
+        """Get a resized slide image (?w=160|320|640|1280)"""
+        slide = self.get_object()
+        return image_derivative_response(request, slide.file)
 
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = NoteSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?search= is handled by NoteFilter against the full-text index
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = NoteFilter
-    search_fields = ['title', 'content']
-    ordering_fields = ['-created_at', '-updated_at']
+    ordering_fields = ['created_at', 'updated_at']
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'student':
-            return Note.objects.filter(Q(student=user) | Q(is_public=True))
-        return Note.objects.all()
+            return Note.objects.filter(Q(student=user) | Q(is_public=True)).select_related('student')
+        return Note.objects.select_related('student')
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.IsAuthenticated()]
         elif self.action in ['create']:
             return [IsStudent()]
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'autosave']:
             return [IsOwner()]
         return [permissions.IsAuthenticated()]
+    
+    def get_object(self):
+        # Make sure buffered autosave edits are visible to detail reads/writes
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if self.action != 'autosave' and str(lookup).isdigit():
+            flush_pending(int(lookup))
+        return super().get_object()
+    
+    def list(self, request, *args, **kwargs):
+        # ?search= and ?tags= read the index and content written on flush
+        flush_student(request.user.pk)
+        return super().list(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        note = serializer.instance
+        buffered_version = discard_buffer(note.pk) or 0
+        serializer.save(version=max(note.version, buffered_version) + 1)
+    
+    @action(detail=True, methods=['patch'])
+    def autosave(self, request, pk=None):
+        """Apply text deltas against a version; writes are coalesced per interval"""
+        note = self.get_object()
+        serializer = NoteAutosaveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            state = autosave(
+                note,
+                serializer.validated_data['base_version'],
+                serializer.validated_data['deltas'],
+                flush=serializer.validated_data['flush'],
+            )
+        except StaleVersion as e:
+            return Response(
+                {'detail': 'Stale version', 'version': e.current_version},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'id': note.id,
+            'version': state['version'],
+            'saved': not state['dirty'],
+            'length': len(state['content']),
+        })
 
 
 # ======================
 # Doubt & AI ViewSets
 # ======================
 
-class DoubtViewSet(viewsets.ModelViewSet):
+QUEUE_REFRESH_SECONDS = 30  # recency scores decay, so an unchanged queue is re-sent this often
+
+
+def _queue_cursor(last_event_id):
+    """[stamp, sent epoch] of the last event a client saw, from its Last-Event-ID"""
+    last_stamp, _, sent = last_event_id.partition('.')
+    return [last_stamp, int(sent) if sent.isdigit() else 0]
+
+
+def _next_queue_event(session_id, cursor):
+    """The next SSE event for a client at `cursor`, or None while it is up to date"""
+    if current_stamp(session_id) == cursor[0] and time.time() - cursor[1] < QUEUE_REFRESH_SECONDS:
+        return None
+    snapshot = get_queue(session_id).snapshot()
+    cursor[:] = snapshot['version'], int(time.time())
+    data = json.dumps(snapshot, cls=DjangoJSONEncoder)
+    return f'event: queue\nid: {cursor[0]}.{cursor[1]}\ndata: {data}\n\n'
+
+
+def doubt_queue_events(session_id, last_event_id=''):
+    """
+    Server-sent events: a ranked snapshot whenever the queue changes, else a
+    periodic refresh, for DOUBT_QUEUE_STREAM_SECONDS; the client then
+    reconnects after DOUBT_QUEUE_RETRY_MS. Event ids carry the stamp and send
+    time, so a client reconnecting with Last-Event-ID is not sent an
+    unchanged queue again. Holds a worker thread; see adoubt_queue_events.
+    """
+    cursor = _queue_cursor(last_event_id)
+    deadline = time.monotonic() + settings.DOUBT_QUEUE_STREAM_SECONDS
+    yield f'retry: {settings.DOUBT_QUEUE_RETRY_MS}\n\n'
+    while True:
+        event = _next_queue_event(session_id, cursor)
+        if event:
+            yield event
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(1)
+
+
+async def adoubt_queue_events(session_id, last_event_id=''):
+    """doubt_queue_events for ASGI servers: an open stream waits on the event loop, not a thread"""
+    cursor = _queue_cursor(last_event_id)
+    deadline = time.monotonic() + settings.DOUBT_QUEUE_STREAM_SECONDS
+    yield f'retry: {settings.DOUBT_QUEUE_RETRY_MS}\n\n'
+    while True:
+        event = await sync_to_async(_next_queue_event)(session_id, cursor)
+        if event:
+            yield event
+        if time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(1)
+
+
+class DoubtViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Doubt.objects.all()
     serializer_class = DoubtSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = DoubtFilter
-    search_fields = ['question', 'subject']
-    ordering_fields = ['-created_at', 'status']
+    search_fields = ['question']
+    ordering_fields = ['asked_at', 'status']
+    # queue_stream reconnects count here rather than against the user rate
+    throttle_scope = 'doubt_queue_stream'
     
     def get_queryset(self):
         user = self.request.user
@@ -484,8 +847,52 @@ class DoubtViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         elif self.action == 'ask_doubt':
             return [IsStudent()]
+        elif self.action in ['queue', 'queue_stream']:
+            return [IsFacultyOrAdmin()]
         return [permissions.IsAuthenticated()]
     
+    def get_throttles(self):
+        if self.action == 'queue_stream':
+            return [ScopedRateThrottle()]
+        return super().get_throttles()
+    
+    def _queue_session(self, request):
+        """Resolve ?session= and check the faculty member teaches it"""
+        session_id = request.query_params.get('session')
+        try:
+            session = ClassSession.objects.select_related('course').get(id=session_id)
+        except (ClassSession.DoesNotExist, ValueError, TypeError):
+            raise NotFound('Session not found')
+        user = request.user
+        if user.role == 'faculty' and user.id not in (session.faculty_id, session.course.faculty_id):
+            raise PermissionDenied('Not your session')
+        return session
+    
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        """Get the ranked open-doubt queue for a session (?session=); poll with If-None-Match"""
+        session = self._queue_session(request)
+        etag = '"%s.%d"' % (current_stamp(session.id), time.time() // QUEUE_REFRESH_SECONDS)
+        if etag in {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}:
+            response = HttpResponseNotModified()
+        else:
+            response = Response(get_queue(session.id).snapshot())
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    @action(detail=False, methods=['get'], url_path='queue/stream',
+            renderer_classes=[FastJSONRenderer, EventStreamRenderer])
+    def queue_stream(self, request):
+        """Stream the ranked queue over SSE; clients reconnect when the stream ends"""
+        session = self._queue_session(request)
+        stream = adoubt_queue_events if isinstance(request._request, ASGIRequest) else doubt_queue_events
+        events = stream(session.id, request.headers.get('Last-Event-ID', ''))
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
     @action(detail=False, methods=['post'])
     def ask_doubt(self, request):
         """Ask a new doubt"""
@@ -507,7 +914,7 @@ class DoubtViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class DoubtResponseViewSet(viewsets.ModelViewSet):
+class DoubtResponseViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = DoubtResponse.objects.all()
     serializer_class = DoubtResponseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -526,7 +933,7 @@ class DoubtResponseViewSet(viewsets.ModelViewSet):
 # Assessment ViewSets
 # ======================
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -538,12 +945,23 @@ class AssignmentViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.IsAuthenticated()]
-        elif self.action in ['create', 'update', 'partial_update', 'destroy']:
+        elif self.action in ['create', 'update', 'partial_update', 'destroy', 'similarity_report']:
             return [IsFacultyOrAdmin()]
         return [permissions.IsAuthenticated()]
+    
+    @action(detail=True, methods=['get'])
+    def similarity_report(self, request, pk=None):
+        """Get every pair of submissions whose fingerprint overlap is at least ?min_score= (default 0.3)"""
+        assignment = self.get_object()
+        if request.user.role == 'faculty' and reference.get('course', assignment.course_id).faculty_id != request.user.id:
+            return Response({'detail': 'You do not teach this course'}, status=status.HTTP_403_FORBIDDEN)
+        min_score = number_param(request, 'min_score', 0.3, minimum=0.0, maximum=1.0)
+        report = similarity_report('submission', 'assignment', assignment.id, min_score=min_score)
+        with_students(Submission, report['pairs'], id_keys=('a', 'b'))
+        return Response(report)
 
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+class SubmissionViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -562,7 +980,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             return [permissions.IsAuthenticated()]
-        elif self.action == 'grade_submission':
+        elif self.action in ['grade_submission', 'bulk_grade', 'similar']:
             return [IsFacultyOrAdmin()]
         elif self.action in ['create', 'update', 'partial_update']:
             return [IsStudent()]
@@ -589,13 +1007,128 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(submission)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Get the ?k= (default 5) most similar submissions to this one in its assignment"""
+        submission = self.get_object()
+        k = number_param(request, 'k', 5, minimum=1, maximum=50)
+        results = top_similar('submission', submission, 'assignment', k=k)
+        return Response(with_students(Submission, results))
+    
+    @action(detail=False, methods=['post'])
+    def bulk_grade(self, request):
+        """
+        Grade many submissions of one assignment in a single request.
+        Accepts a CSV upload (`file`) or JSON `grades` list of
+        {submission | student | username, score, feedback}.
+        """
+        assignment_id = request.data.get('assignment')
+        try:
+            assignment = Assignment.objects.get(id=assignment_id)
+        except (Assignment.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'detail': 'Assignment not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if request.user.role == 'faculty' and reference.get('course', assignment.course_id).faculty_id != request.user.id:
+            return Response(
+                {'detail': 'You do not teach this course'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if 'file' in request.FILES:
+            rows = read_csv_rows(request.FILES['file'])
+        else:
+            rows = request.data.get('grades')
+            if not isinstance(rows, list):
+                return Response(
+                    {'detail': 'Provide a CSV file or a grades list'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        partial = str(request.data.get('partial', '')).lower() in ('1', 'true', 'yes')
+        try:
+            graded, errors = bulk_grade(assignment, rows, partial=partial)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({'detail': f'Unreadable CSV: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        status_code = status.HTTP_400_BAD_REQUEST if errors and not partial else status.HTTP_200_OK
+        return Response({'graded': graded, 'errors': errors}, status=status_code)
+
+
+class UploadViewSet(SparseQuerysetMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads:
+    POST /uploads/ {filename, size, sha256} -> PUT /uploads/{id}/chunk/ (Upload-Offset header,
+    raw body) -> POST /uploads/{id}/complete/. GET /uploads/{id}/ returns the offset to resume from.
+    """
+    serializer_class = UploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Upload.objects.filter(user=self.request.user)
+    
+    def _error(self, e):
+        body = {'detail': str(e)}
+        if e.offset is not None:
+            body['offset'] = e.offset
+        return Response(body, status=e.status_code)
+    
+    def create(self, request):
+        """Open an upload (completes at once if the same content is already stored)"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = start_upload(
+                request.user,
+                serializer.validated_data['filename'],
+                serializer.validated_data['size'],
+                serializer.validated_data.get('sha256', ''),
+            )
+        except UploadError as e:
+            return self._error(e)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['put', 'patch'])
+    def chunk(self, request, pk=None):
+        """Append raw bytes at Upload-Offset; the body is streamed to disk, never buffered"""
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response(
+                {'detail': 'Upload-Offset and Content-Length must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            upload = write_chunk(upload.pk, request.user, offset, request._request, length)
+        except UploadError as e:
+            return self._error(e)
+        return Response(self.get_serializer(upload).data)
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Verify the checksum and move the file into content-addressed storage"""
+        upload = self.get_object()
+        try:
+            upload = complete_upload(upload.pk, request.user)
+        except UploadError as e:
+            return self._error(e)
+        return Response(self.get_serializer(upload).data)
+    
+    def perform_destroy(self, instance):
+        discard_part(instance)
+        instance.delete()
 
 
 # ======================
 # Analytics ViewSets
 # ======================
 
-class SessionReportViewSet(viewsets.ReadOnlyModelViewSet):
+class SessionReportViewSet(SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SessionReport.objects.all()
     serializer_class = SessionReportSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -607,8 +1140,9 @@ class SessionReportViewSet(viewsets.ReadOnlyModelViewSet):
         if user.role == 'faculty':
             return SessionReport.objects.filter(session__faculty=user)
         elif user.role == 'student':
+            # Past courses too: a completed enrollment keeps its reports
             return SessionReport.objects.filter(
-                session__course__enrollments__student=user
+                session__course_id__in=Enrollment.objects.filter(student=user).values('course_id')
             )
         return SessionReport.objects.all()
     
@@ -651,12 +1185,13 @@ class SessionReportViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class StudentPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
+class StudentPerformanceViewSet(SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = StudentPerformance.objects.all()
     serializer_class = StudentPerformanceSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = StudentPerformanceFilter
+    ordering_fields = ['at_risk_score', 'total_attendance_percentage', 'average_assignment_score']
     
     def get_queryset(self):
         user = self.request.user
@@ -665,6 +1200,66 @@ class StudentPerformanceViewSet(viewsets.ReadOnlyModelViewSet):
         elif user.role == 'faculty':
             return StudentPerformance.objects.filter(course__faculty=user)
         return StudentPerformance.objects.all()
+    
+    def get_permissions(self):
+        if self.action == 'recompute':
+            return [IsFacultyOrAdmin()]
+        return [permissions.IsAuthenticated()]
+    
+    @action(detail=False, methods=['post'])
+    def recompute(self, request):
+        """Recompute metrics and at-risk scores for one course, or all of the caller's courses"""
+        user = request.user
+        courses = Course.objects.all()
+        if user.role == 'faculty':
+            courses = courses.filter(faculty=user)
+        elif user.college_id:
+            courses = courses.filter(program__college_id=user.college_id)
+        course_id = request.data.get('course')
+        if course_id:
+            courses = courses.filter(id=course_id)
+            if not courses.exists():
+                return Response({'detail': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'recomputed': recompute_performance(courses)})
+
+
+class AnalyticsExportViewSet(viewsets.ViewSet):
+    """Columnar (Parquet / Arrow IPC) exports of raw analytics tables for the data team"""
+    permission_classes = [IsSuperAdmin]
+    renderer_classes = [FastJSONRenderer, ParquetRenderer, ArrowRenderer]
+    lookup_value_regex = '[a-z_]+'
+    
+    def list(self, request):
+        """List exportable datasets"""
+        return Response({'datasets': list(DATASETS), 'formats': list(FORMATS)})
+    
+    def retrieve(self, request, pk=None):
+        """Download one dataset (?format=parquet|arrow&start=&end=&after_id=)"""
+        if pk not in DATASETS:
+            raise NotFound('Unknown dataset')
+        fmt = request.accepted_renderer.format
+        if fmt not in FORMATS:
+            fmt = 'parquet'
+        try:
+            start = parse_bound(request.query_params.get('start'))
+            end = parse_bound(request.query_params.get('end'))
+        except ValueError as exc:
+            raise ValidationError({'detail': str(exc)})
+        after_id = number_param(request, 'after_id', 0, minimum=0)
+        
+        # Written to a temp file first: Parquet needs its footer before it can be read
+        sink = tempfile.TemporaryFile()
+        try:
+            count, last_id = export_dataset(pk, sink, fmt, start, end, after_id)
+        except ExportUnavailable as exc:
+            sink.close()
+            return Response({'detail': str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        sink.seek(0)
+        response = FileResponse(sink, as_attachment=True, filename=f'{pk}-{after_id + 1}-{last_id}{FORMATS[fmt]}',
+                                content_type=ParquetRenderer.media_type if fmt == 'parquet' else ArrowRenderer.media_type)
+        response['X-Row-Count'] = count
+        response['X-High-Water-Mark'] = last_id
+        return response
 
 
 # ======================
@@ -760,7 +1355,7 @@ class CompileCodeView(viewsets.ViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CompilerSubmissionViewSet(viewsets.ModelViewSet):
+class CompilerSubmissionViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """Manage code submissions"""
     queryset = CompilerSubmission.objects.all()
     serializer_class = CompilerSubmissionSerializer
@@ -777,11 +1372,24 @@ class CompilerSubmissionViewSet(viewsets.ModelViewSet):
             return CompilerSubmission.objects.filter(session__faculty=user)
         return CompilerSubmission.objects.all()
     
+    def get_permissions(self):
+        if self.action == 'similar':
+            return [IsFacultyOrAdmin()]
+        return [permissions.IsAuthenticated()]
+    
     def perform_create(self, serializer):
         serializer.save(student=self.request.user)
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Get the ?k= (default 5) most similar code runs from the same session"""
+        submission = self.get_object()
+        k = number_param(request, 'k', 5, minimum=1, maximum=50)
+        results = top_similar('compiler_submission', submission, 'session', k=k)
+        return Response(with_students(CompilerSubmission, results))
 
 
-class ScreenLockViewSet(viewsets.ModelViewSet):
+class ScreenLockViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """Manage screen locks for students"""
     queryset = ScreenLock.objects.all()
     serializer_class = ScreenLockSerializer
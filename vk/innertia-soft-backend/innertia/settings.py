@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -120,6 +121,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New and rehashed passwords use the first hasher; the others still verify
+# existing hashes, which are upgraded on the user's next successful login
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'django.contrib.auth.hashers.ScryptPasswordHasher')
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher for hasher in (
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ) if hasher != PASSWORD_HASHER
+]
+
+AUTHENTICATION_BACKENDS = ['core.login.PooledModelBackend']
+
+# Password hashing for logins runs on a bounded thread pool (per process) so
+# a burst of logins cannot take every core; beyond the queue logins get 503
+LOGIN_HASH_WORKERS = int(os.getenv('LOGIN_HASH_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+LOGIN_HASH_QUEUE = 256
+LOGIN_HASH_TIMEOUT = 30
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -138,6 +160,54 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (slides, submissions, profile pictures)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Resized image variants served by /slides/{id}/image/ and /users/{id}/avatar/
+IMAGE_DERIVATIVE_ROOT = MEDIA_ROOT / 'derivatives'
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_MAX_AGE = 60 * 60 * 24 * 365  # 1 year; URLs change with content
+
+# Resumable uploads (/api/uploads/): partial files are kept outside the served media
+UPLOAD_TEMP_ROOT = BASE_DIR / 'upload_parts'
+UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+
+# Note autosave: buffered edits are written at most once per interval (seconds)
+NOTE_AUTOSAVE_INTERVAL = 10
+
+# Faculty doubt queue SSE: each stream ends after this long and the client
+# reconnects DOUBT_QUEUE_RETRY_MS later. Served from innertia.asgi an open
+# stream costs no thread; under WSGI each one holds a worker until it ends
+DOUBT_QUEUE_STREAM_SECONDS = int(os.getenv('DOUBT_QUEUE_STREAM_SECONDS', 300))
+DOUBT_QUEUE_RETRY_MS = 3000
+
+# Shared cache: throttle counters, cross-worker locks, autosave buffers, token
+# revocations and the app's cached data must be visible to every worker.
+# Set REDIS_URL for multi-process / multi-node deployments; otherwise a SQLite
+# file shared by the processes on this host stands in (dev and tests). It lives
+# beside the project, not in the temp dir, where other users could read or
+# pre-create it and the OS may clean it out from under running workers.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'innertia',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.getenv('CACHE_PATH', str(BASE_DIR / 'innertia-cache.sqlite3')),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -146,11 +216,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_FILTER_BACKENDS': (
@@ -159,12 +238,13 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'core.throttling.AnonRateThrottle',
+        'core.throttling.UserRateThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
         'user': '1000/hour',
+        'doubt_queue_stream': '120/hour',
     },
 }
 
@@ -178,6 +258,11 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
 }
 
+# JSON and text responses at least this large (bytes) are compressed; Brotli
+# when the client accepts it and brotli is installed, gzip otherwise
+COMPRESSION_MIN_SIZE = 1024
+BROTLI_QUALITY = 4  # 0-11; higher squeezes a little more for far more CPU
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",